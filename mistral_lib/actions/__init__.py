@@ -16,15 +16,21 @@
 from mistral_lib.actions.base import Action
 from mistral_lib.actions.base import ActionDescriptor
 from mistral_lib.actions.base import ActionProvider
+from mistral_lib.actions.base import BatchAction
 from mistral_lib.actions.providers.composite import CompositeActionProvider
 from mistral_lib.actions.providers.python import PythonActionDescriptor
+from mistral_lib.actions.runner import ActionRunner
 from mistral_lib.actions.types import Result
+from mistral_lib.actions.types import ResultBatch
 
 __all__ = [
     'Action',
+    'BatchAction',
     'Result',
+    'ResultBatch',
     'ActionDescriptor',
     'ActionProvider',
     'PythonActionDescriptor',
-    'CompositeActionProvider'
+    'CompositeActionProvider',
+    'ActionRunner'
 ]
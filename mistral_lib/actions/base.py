@@ -17,7 +17,9 @@ import abc
 
 from oslo_utils import importutils
 
+from mistral_lib.actions import types
 from mistral_lib import serialization
+from mistral_lib import utils
 from mistral_lib.utils import inspect_utils as i_utils
 
 
@@ -44,6 +46,15 @@ class Action(serialization.MistralSerializable):
         # but don't define their own __init__.
         pass
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Dynamic classes are created on every action instantiation
+        # and they're never returned by utils.get_subclasses() from
+        # the cache anyway.
+        if not utils.is_dynamic_class(cls):
+            utils.track_subclasses(cls)
+
     @abc.abstractmethod
     def run(self, context):
         """Run action logic.
@@ -89,6 +100,48 @@ class Action(serialization.MistralSerializable):
         return "%s.%s" % (Action.__module__, Action.__name__)
 
 
+utils.track_subclasses(Action)
+
+
+class BatchAction(Action):
+    """Action that can process a batch of inputs at once.
+
+    A typical use case is a "with-items" task that runs the same action
+    many times with different inputs. An action implementing this
+    protocol can override the method run_batch() to set up connections,
+    authenticate and do other expensive preparations only once per batch
+    rather than once per item.
+    """
+
+    @classmethod
+    def run_batch(cls, actions, contexts):
+        """Run action logic for a batch of items.
+
+        The default implementation runs every action one by one. An error
+        of a particular item, i.e. any exception raised by its action, is
+        reported as an error result of this item, same as if the items
+        were run separately. Raising an exception from this method means
+        that the whole batch failed.
+
+        :param actions: A list of action instances, one per item, created
+            with the parameters of the item.
+        :param contexts: A list of action contexts, one per item.
+        :return: A list of results of the same length as "actions". Each
+            result is either a value or an instance of
+            mistral_lib.types.Result, same as for the method run().
+        """
+
+        results = []
+
+        for action, ctx in zip(actions, contexts, strict=True):
+            try:
+                results.append(action.run(ctx))
+            except Exception as e:
+                results.append(types.Result(error=str(e)))
+
+        return results
+
+
 class ActionSerializer(serialization.DictBasedSerializer):
     def serialize_to_dict(self, entity):
         cls = type(entity)
@@ -110,7 +163,7 @@ class ActionSerializer(serialization.DictBasedSerializer):
         if cls_attrs:
             # If we have serialized class attributes it means that we need
             # to create a dynamic class.
-            cls = type(cls.__name__, (cls,), cls_attrs)
+            cls = utils.create_dynamic_class(cls, cls_attrs)
 
         # NOTE(rakhmerov): We use this hacky was of instantiating
         # the action here because we can't use normal __init__(),
@@ -170,7 +223,8 @@ class ActionDescriptor(abc.ABC):
         Each parameter name can be either just a name or a string
         "param=val" where "param" is the name of the parameter
         and "val" its default value. The values are only indications
-        for the user and not used in the action instantiation process.
+        for the user and not used in the action instantiation process,
+        unless the input is prepared with resolve_input().
         The string is split along the commas and then the parts along the
         equal signs. Escaping is not possible.
         """
@@ -246,6 +300,21 @@ class ActionDescriptor(abc.ABC):
         """
         pass
 
+    def instantiate_batch(self, inputs, wf_ctx):
+        """Instantiate actions for a batch of inputs.
+
+        Descriptors may override this method to share expensive
+        preparations between the actions of the batch.
+
+        :param inputs: A list of action parameter dictionaries.
+        :param wf_ctx: Workflow context relevant for the point when
+            actions are about to start.
+        :return: A list of mistral_lib.actions.Action instances, one
+            per input.
+        """
+
+        return [self.instantiate(params, wf_ctx) for params in inputs]
+
     @abc.abstractmethod
     def check_parameters(self, params):
         """Validate action parameters.
@@ -263,6 +332,40 @@ class ActionDescriptor(abc.ABC):
         """
         pass
 
+    def check_parameters_batch(self, inputs):
+        """Validate parameters of a batch of actions.
+
+        :param inputs: A list of action parameter dictionaries.
+        :return: None or raises an exception if some of the given
+            parameters are not valid.
+        """
+
+        for params in inputs:
+            self.check_parameters(params)
+
+    def resolve_input(self, params):
+        """Validates action parameters and applies their default values.
+
+        :param params: Action parameters as a dictionary where keys
+            are parameter names and values are parameter values.
+        :return: A new dictionary of parameters that can be passed to the
+            action initializer, i.e. the given parameters plus default
+            values of the parameters that are not given. Raises an
+            exception if the given parameters are not valid.
+        """
+
+        self.check_parameters(params)
+
+        res = {
+            k: v
+            for k, v in utils.get_dict_from_string(self.params_spec).items()
+            if v is not utils.NotDefined and not k.startswith('**')
+        }
+
+        res.update(params or {})
+
+        return res
+
     @abc.abstractmethod
     def post_process_result(self, result):
         """Converts the given action result.
@@ -10,41 +10,81 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+import threading
 import warnings
 
 from mistral_lib import serialization
 
 
+_DEPRECATED_ATTRS = frozenset([
+    "auth_cacert", "auth_token", "auth_uri", "expires_at", "insecure",
+    "is_target", "is_trust_scoped", "project_id", "project_name",
+    "redelivered", "region_name", "service_catalog", "trust_id",
+    "user_name"
+])
+
+# Names of the deprecated attributes that have already been warned about.
+_warned_attrs = set()
+
+_CONTENT_REF_KEY = '__content_ref'
+
+
 class ActionContext(serialization.MistralSerializable):
+    """Context passed to actions.
+
+    Note that the security context is kept by reference. The same
+    security context, including its potentially large service catalog,
+    can be shared between many action contexts (e.g. for all items of
+    a "with-items" task) so actions must not modify it.
+    """
+
+    __slots__ = ('security', 'execution')
 
     def __init__(self, security_ctx=None, execution_ctx=None):
         self.security = security_ctx
         self.execution = execution_ctx
 
-    def _deprecation_warning(self, name):
-        warnings.warn(
-            "context.{0} is deprecated from the context passed to actions. "
-            "Please use context.security.{0}. It will be removed in a future "
-            "release.", DeprecationWarning
-        )
 
-    def __getattribute__(self, name):
-        deprecated = [
-            "auth_cacert", "auth_token", "auth_uri", "expires_at", "insecure",
-            "is_target", "is_trust_scoped", "project_id", "project_name",
-            "redelivered", "region_name", "service_catalog", "trust_id",
-            "user_name"
-        ]
+def _deprecation_warning(name):
+    # Warn only once per attribute name, contexts are accessed
+    # too often to warn on every access.
+    if name in _warned_attrs:
+        return
+
+    _warned_attrs.add(name)
+
+    warnings.warn(
+        "context.{0} is deprecated from the context passed to actions. "
+        "Please use context.security.{0}. It will be removed in a future "
+        "release.".format(name), DeprecationWarning, stacklevel=3
+    )
+
 
-        if name in deprecated:
-            self._deprecation_warning(name)
+def _deprecated_attr(name):
+    def _get(self):
+        _deprecation_warning(name)
 
-            return getattr(self.security, name)
+        return getattr(self.security, name)
 
-        return super(ActionContext, self).__getattribute__(name)
+    return property(_get)
+
+
+# NOTE: Deprecated attributes are implemented as properties rather than
+# in __getattribute__() or __getattr__() so that access to the regular
+# attributes is as fast as for a plain object.
+for _name in sorted(_DEPRECATED_ATTRS):
+    setattr(ActionContext, _name, _deprecated_attr(_name))
 
 
 class SecurityContext(object):
+    __slots__ = (
+        'auth_uri', 'auth_cacert', 'insecure', 'service_catalog',
+        'region_name', 'is_trust_scoped', 'redelivered', 'expires_at',
+        'trust_id', 'is_target', 'project_id', 'project_name', 'user_name',
+        'auth_token'
+    )
+
     def __init__(self, auth_uri=None, auth_cacert=None, insecure=None,
                  service_catalog=None, region_name=None, is_trust_scoped=None,
                  redelivered=None, expires_at=None, trust_id=None,
@@ -65,8 +105,36 @@ class SecurityContext(object):
         self.user_name = user_name
         self.auth_token = auth_token
 
+    def to_dict(self):
+        # Subclasses have their own (empty) __slots__.
+        return {
+            name: getattr(self, name) for name in SecurityContext.__slots__
+        }
+
+
+class _ReadOnlySecurityContext(SecurityContext):
+    """Security context shared between many action contexts."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            "Shared security context can't be modified: %s" % name
+        )
+
+    def __delattr__(self, name):
+        raise AttributeError(
+            "Shared security context can't be modified: %s" % name
+        )
+
 
 class ExecutionContext(object):
+    __slots__ = (
+        'workflow_execution_id', 'task_execution_id', 'action_execution_id',
+        'workflow_name', 'callback_url', 'with_items_index', 'task_rerun_no',
+        'task_rerun_id', 'workflow_propagated_headers'
+    )
+
     def __init__(self, workflow_execution_id=None, task_execution_id=None,
                  action_execution_id=None, workflow_name=None,
                  callback_url=None, task_id=None, with_items_index=0,
@@ -99,19 +167,143 @@ class ExecutionContext(object):
 
         return self.task_execution_id
 
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
 
 class ActionContextSerializer(serialization.DictBasedSerializer):
+    """Action context serializer.
+
+    If "security_cache_size" is greater than zero, when deserializing,
+    the serializer reuses security contexts that it has recently created
+    if they are equal to the one being deserialized. So contexts of
+    actions running on behalf of the same user (e.g. all items of a
+    "with-items" task) share one security context and one service catalog
+    instead of keeping their own copies. Shared security contexts are
+    read-only, and their service catalogs must not be modified in place
+    either. By default every deserialized context gets its own security
+    context.
+
+    If a content resolver is given, the serializer works in the content
+    addressed mode. Big values of the security context fields listed in
+    "content_fields" are sent as references to their digests. The values
+    are published to the resolver once and the receiving side resolves
+    them from its local bounded cache or, if missing, from the resolver.
+    Both sides must be configured with the resolver. If the resolver
+    expires values, "content_republish_interval" must be set, see
+    serialization.ContentCache.
+    """
+
+    def __init__(self, security_cache_size=0, content_resolver=None,
+                 content_fields=('service_catalog',), content_threshold=1024,
+                 content_cache_size=64, content_republish_interval=None):
+        self._security_cache_size = security_cache_size
+        self._security_cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self._content_cache = (
+            serialization.ContentCache(
+                content_resolver,
+                content_cache_size,
+                content_republish_interval
+            )
+            if content_resolver else None
+        )
+        self._content_fields = content_fields
+        self._content_threshold = content_threshold
+
     def serialize_to_dict(self, entity):
+        security_dict = entity.security.to_dict()
+
+        if self._content_cache:
+            for name in self._content_fields:
+                security_dict[name] = self._to_content_ref(
+                    security_dict[name]
+                )
+
         return {
-            'security': vars(entity.security),
-            'execution': vars(entity.execution),
+            'security': security_dict,
+            'execution': entity.execution.to_dict(),
         }
 
     def deserialize_from_dict(self, entity_dict):
+        security_dict = entity_dict['security']
+
+        for name in self._content_fields:
+            val = security_dict.get(name)
+
+            if isinstance(val, dict) and _CONTENT_REF_KEY in val:
+                security_dict = dict(security_dict)
+                security_dict[name] = self._from_content_ref(val)
+
         return ActionContext(
-            security_ctx=SecurityContext(**entity_dict['security']),
+            security_ctx=self._get_security_context(security_dict),
             execution_ctx=ExecutionContext(**entity_dict['execution'])
         )
 
+    def _to_content_ref(self, val):
+        if val is None:
+            return val
+
+        digest, size = self._content_cache.get_digest(val)
+
+        if size < self._content_threshold:
+            return val
+
+        self._content_cache.put(digest, val)
+
+        return {_CONTENT_REF_KEY: digest}
+
+    def _from_content_ref(self, ref):
+        if self._content_cache is None:
+            raise RuntimeError(
+                "Failed to resolve a content reference, the serializer"
+                " is not configured with a content resolver: %s" % ref
+            )
+
+        return self._content_cache.get(ref[_CONTENT_REF_KEY])
+
+    def _get_security_context(self, security_dict):
+        if self._security_cache_size <= 0:
+            return SecurityContext(**security_dict)
+
+        # All fields except the service catalog are normally scalars
+        # so they make a cheap cache key. The catalog is compared only
+        # when everything else matches.
+        try:
+            key = tuple(
+                security_dict.get(name) for name in SecurityContext.__slots__
+                if name != 'service_catalog'
+            )
+
+            hash(key)
+        except TypeError:
+            return SecurityContext(**security_dict)
+
+        with self._lock:
+            security_ctx = self._security_cache.get(key)
+
+            catalog = security_dict.get('service_catalog')
+
+            if (security_ctx is not None and
+                    (security_ctx.service_catalog is catalog or
+                     security_ctx.service_catalog == catalog)):
+                self._security_cache.move_to_end(key)
+
+                return security_ctx
+
+            security_ctx = SecurityContext(**security_dict)
+
+            # Make the context read-only since it's shared by actions that
+            # may run concurrently on behalf of different executions.
+            security_ctx.__class__ = _ReadOnlySecurityContext
+
+            self._security_cache[key] = security_ctx
+
+            if len(self._security_cache) > self._security_cache_size:
+                self._security_cache.popitem(last=False)
+
+            return security_ctx
+
 
 serialization.register_serializer(ActionContext, ActionContextSerializer())
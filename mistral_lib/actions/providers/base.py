@@ -28,28 +28,84 @@ def _compare_parameters(expected_params, actual_params):
     :return: Tuple {missing parameter names, unexpected parameter names}
     """
 
-    missing_params = []
-    unexpected_params = copy.deepcopy(list((actual_params or {}).keys()))
+    actual_params = actual_params or {}
 
-    for p_name, p_value in expected_params.items():
-        if p_value is utils.NotDefined and p_name not in unexpected_params:
-            missing_params.append(str(p_name))
+    missing_params = [
+        str(p_name) for p_name, p_value in expected_params.items()
+        if p_value is utils.NotDefined and p_name not in actual_params
+    ]
 
-        if p_name in unexpected_params:
-            unexpected_params.remove(p_name)
+    unexpected_params = [
+        p_name for p_name in actual_params if p_name not in expected_params
+    ]
 
     return missing_params, unexpected_params
 
 
+class _ParsedParamsSpec(object):
+    """Parameter specification parsed once per descriptor."""
+
+    __slots__ = ('spec', 'expected', 'var_kwargs', 'defaults',
+                 'mutable_defaults')
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.expected = utils.get_dict_from_string(spec)
+
+        # Don't validate action input if action initialization
+        # method contains ** argument.
+        self.var_kwargs = '**' in spec
+
+        defaults = [
+            (k, v) for k, v in self.expected.items()
+            if v is not utils.NotDefined and not k.startswith('**')
+        ]
+
+        # Immutable defaults are shared by all inputs, mutable ones are
+        # copied for every input so that actions can't affect each other.
+        self.defaults = tuple(
+            (k, v) for k, v in defaults if not isinstance(v, (dict, list))
+        )
+        self.mutable_defaults = tuple(
+            (k, v) for k, v in defaults if isinstance(v, (dict, list))
+        )
+
+
+def _compile_params_validator(params_schema):
+    """Compiles the parameter schema into a validating function.
+
+    :param params_schema: A dictionary where keys are parameter names and
+        values are classes or tuples of classes acceptable for them.
+    :return: A function accepting a dictionary of parameters and returning
+        a list of names of parameters with invalid types.
+    """
+
+    checks = tuple(params_schema.items())
+
+    def _validate(params):
+        return [
+            name for name, types in checks
+            if name in params and not isinstance(params[name], types)
+        ]
+
+    return _validate
+
+
 class ActionDescriptorBase(actions.ActionDescriptor, abc.ABC):
     def __init__(self, name, desc, params_spec, namespace=None,
-                 project_id=None, scope=None):
+                 project_id=None, scope=None, params_schema=None):
         self._name = name
         self._desc = desc
         self._params_spec = params_spec
         self._namespace = namespace
         self._project_id = project_id
         self._scope = scope
+        self._params_schema = params_schema
+        self._parsed_params_spec = None
+        self._params_validator = (
+            _compile_params_validator(params_schema)
+            if params_schema else None
+        )
 
     @property
     def name(self):
@@ -63,6 +119,10 @@ class ActionDescriptorBase(actions.ActionDescriptor, abc.ABC):
     def params_spec(self):
         return self._params_spec
 
+    @property
+    def params_schema(self):
+        return self._params_schema
+
     @property
     def namespace(self):
         return self._namespace
@@ -83,14 +143,50 @@ class ActionDescriptorBase(actions.ActionDescriptor, abc.ABC):
     def action_class_attributes(self):
         return None
 
+    def _get_parsed_params_spec(self):
+        parsed = self._parsed_params_spec
+        spec = self.params_spec
+
+        if parsed is None or parsed.spec is not spec:
+            parsed = _ParsedParamsSpec(spec)
+
+            self._parsed_params_spec = parsed
+
+        return parsed
+
     def check_parameters(self, params):
-        # Don't validate action input if action initialization
-        # method contains ** argument.
-        if '**' in self.params_spec:
+        parsed = self._get_parsed_params_spec()
+
+        if parsed.var_kwargs:
+            self._check_parameter_types(params)
+
             return
 
-        expected_params = utils.get_dict_from_string(self.params_spec)
+        self._check_parameters(parsed.expected, params)
+
+    def resolve_input(self, params):
+        parsed = self._get_parsed_params_spec()
+
+        params = params or {}
 
+        if parsed.var_kwargs:
+            self._check_parameter_types(params)
+        else:
+            self._check_parameters(parsed.expected, params)
+
+        res = dict(params)
+
+        for k, v in parsed.defaults:
+            if k not in res:
+                res[k] = v
+
+        for k, v in parsed.mutable_defaults:
+            if k not in res:
+                res[k] = copy.deepcopy(v)
+
+        return res
+
+    def _check_parameters(self, expected_params, params):
         actual_params = params or {}
 
         missing, unexpected = _compare_parameters(
@@ -114,5 +210,19 @@ class ActionDescriptorBase(actions.ActionDescriptor, abc.ABC):
 
             raise exc.ActionException(msg % tuple(msg_props))
 
+        self._check_parameter_types(actual_params)
+
+    def _check_parameter_types(self, params):
+        if self._params_validator is None or not params:
+            return
+
+        invalid = self._params_validator(params)
+
+        if invalid:
+            raise exc.ActionException(
+                'Invalid input [name=%s, class=%s, invalid_types=%s]' %
+                (self.name, self.action_class_name, invalid)
+            )
+
     def post_process_result(self, result):
         return result
@@ -13,19 +13,29 @@
 #    limitations under the License.
 
 from mistral_lib.actions.providers import base
+from mistral_lib import utils
 from mistral_lib.utils import inspect_utils as i_utils
 
 
 class PythonActionDescriptor(base.ActionDescriptorBase):
     def __init__(self, name, action_cls, action_cls_attrs=None, namespace=None,
-                 project_id=None, scope=None):
+                 project_id=None, scope=None, check_types=False):
+        """Creates the descriptor.
+
+        :param check_types: If True, types of action parameters are
+            validated by check_parameters() according to the type
+            annotations of the action initializer.
+        """
+
         super(PythonActionDescriptor, self).__init__(
             name,
             i_utils.get_docstring(action_cls),
             i_utils.get_arg_list_as_str(action_cls.__init__),
             namespace,
             project_id,
-            scope
+            scope,
+            i_utils.get_arg_types(action_cls.__init__) if check_types
+            else None
         )
 
         self._action_cls = action_cls
@@ -37,18 +47,24 @@ class PythonActionDescriptor(base.ActionDescriptorBase):
             self._action_cls
         )
 
-    def instantiate(self, params, wf_ctx):
+    def _get_action_class(self):
         if not self._action_cls_attrs:
             # No need to create new dynamic type.
-            return self._action_cls(**params)
+            return self._action_cls
 
-        dynamic_cls = type(
-            self._action_cls.__name__,
-            (self._action_cls,),
+        return utils.create_dynamic_class(
+            self._action_cls,
             self._action_cls_attrs
         )
 
-        return dynamic_cls(**params)
+    def instantiate(self, params, wf_ctx):
+        return self._get_action_class()(**params)
+
+    def instantiate_batch(self, inputs, wf_ctx):
+        # All actions of the batch can share the same dynamic class.
+        action_cls = self._get_action_class()
+
+        return [action_cls(**params) for params in inputs]
 
     @property
     def action_class(self):
@@ -0,0 +1,516 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from concurrent import futures
+import heapq
+import itertools
+import threading
+import time
+
+from oslo_log import log as logging
+
+# NOTE: The context module is imported to make sure its serializer is
+# registered in child processes that only import this module.
+from mistral_lib.actions import base
+from mistral_lib.actions import context as ctx  # noqa
+from mistral_lib.actions import types
+from mistral_lib import serialization
+
+
+LOG = logging.getLogger(__name__)
+
+
+def _is_cpu_bound(action):
+    # NOTE: The attribute is read from the class and it's not declared
+    # on the base Action class on purpose. Otherwise it would be considered
+    # a public class field of every action by ActionSerializer and every
+    # serialized action would turn into a dynamic class on the other side.
+    return bool(getattr(type(action), 'cpu_bound', False))
+
+
+def _error_result(action, e):
+    msg = "The action raised an exception [action=%s, msg='%s']" % (action, e)
+
+    return types.Result(error=msg)
+
+
+def _convert_result(action, result):
+    # NOTE: Errors are reported even for asynchronous actions since
+    # the result won't be delivered in any other way, same as if the
+    # action raised an exception.
+    if isinstance(result, types.Result):
+        if result.is_error() or action.is_sync():
+            return result
+
+        return None
+
+    if not action.is_sync():
+        return None
+
+    return types.Result(data=result)
+
+
+def _run_action(action, context):
+    """Runs the action and converts its outcome into a Result.
+
+    :return: An instance of Result or None if the action is asynchronous
+        and it didn't fail.
+    """
+
+    try:
+        result = action.run(context)
+    except Exception as e:
+        LOG.warning(
+            "The action raised an exception [action=%s]",
+            action,
+            exc_info=True
+        )
+
+        return _error_result(action, e)
+
+    return _convert_result(action, result)
+
+
+def _run_batch(actions, contexts):
+    """Runs a batch of actions created by the same descriptor.
+
+    :return: A list of results, one per action. Same as for _run_action()
+        the results of asynchronous actions are None unless they failed.
+    """
+
+    action_cls = type(actions[0])
+
+    if not issubclass(action_cls, base.BatchAction):
+        return [_run_action(a, c) for a, c in zip(actions, contexts)]
+
+    try:
+        results = action_cls.run_batch(actions, contexts)
+
+        if len(results) != len(actions):
+            raise RuntimeError(
+                "Number of batch results doesn't match number of items"
+                " [expected=%s, actual=%s]" % (len(actions), len(results))
+            )
+    except Exception as e:
+        LOG.warning(
+            "The batch action raised an exception [action=%s]",
+            action_cls,
+            exc_info=True
+        )
+
+        return [_error_result(a, e) for a in actions]
+
+    return [_convert_result(a, r) for a, r in zip(actions, results)]
+
+
+def _run_serialized_action(action_str, context_str):
+    # Runs in a child process so the action and its context travel
+    # in a serialized form the same way they do for remote executors.
+    serializer = serialization.get_polymorphic_serializer()
+
+    result = _run_action(
+        serializer.deserialize(action_str),
+        serializer.deserialize(context_str)
+    )
+
+    return serializer.serialize(result)
+
+
+def _timeout_result(action):
+    return types.Result(
+        error="The action timed out [action=%s]" % action
+    )
+
+
+class _ResultFuture(futures.Future):
+    """A future of an action result that knows its deadline."""
+
+    def __init__(self, deadline):
+        super(_ResultFuture, self).__init__()
+
+        self.deadline = deadline
+        self.action = None
+
+    def expire(self):
+        """Completes the future with a timeout error if it's not done."""
+
+        try:
+            self.set_result(_timeout_result(self.action))
+        except futures.InvalidStateError:
+            # Completed in the meantime.
+            pass
+
+
+class _DeadlineWatcher(object):
+    """Expires result futures when their deadlines pass.
+
+    One background thread serves all futures of a runner so that
+    timeouts are enforced even if nobody waits for the results.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def watch(self, future):
+        with self._cond:
+            heapq.heappush(
+                self._heap,
+                (future.deadline, next(self._counter), future)
+            )
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='mistral-action-deadlines',
+                    daemon=True
+                )
+                self._thread.start()
+
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            expired = []
+
+            with self._cond:
+                if self._stopped:
+                    return
+
+                now = time.monotonic()
+                heap = self._heap
+
+                while heap and (heap[0][0] <= now or heap[0][2].done()):
+                    expired.append(heapq.heappop(heap)[2])
+
+                if not expired:
+                    self._cond.wait(heap[0][0] - now if heap else None)
+
+            for future in expired:
+                future.expire()
+
+
+class ActionRunner(object):
+    """Runs actions on a bounded pool of workers.
+
+    The runner implements the common executor sequence: instantiate an
+    action using its descriptor, run it, convert the returned value into
+    an instance of Result and pass it through the descriptor post
+    processing. Exceptions raised by actions are converted into error
+    results.
+
+    Actions run on a thread pool by default. Actions whose class has
+    the attribute "cpu_bound" set to True are routed to a process pool,
+    if it's enabled, so that they don't compete for the GIL with the
+    rest of the actions. Such actions, as well as their contexts, must
+    be serializable with the polymorphic serializer.
+
+    The number of actions submitted but not completed yet is limited by
+    "queue_size". When the limit is reached a submitting thread blocks
+    until one of the running actions completes or until the deadline of
+    the submitted action passes. An action keeps its place in the queue
+    until it really completes, even if it has timed out, so hung actions
+    hold back new ones instead of letting them pile up behind them.
+    Timeouts are enforced by a background thread so a result future
+    completes at its deadline even if nobody waits for it.
+    """
+
+    def __init__(self, max_workers=10, max_processes=0, queue_size=None,
+                 timeout=None):
+        """Creates the runner.
+
+        :param max_workers: Number of threads running actions.
+        :param max_processes: Number of processes running CPU bound
+            actions. If 0, CPU bound actions run on the thread pool.
+        :param queue_size: Maximum number of submitted but not completed
+            actions. Defaults to twice the number of all workers.
+        :param timeout: Default number of seconds given to an action to
+            complete. None means no limit.
+        """
+
+        if queue_size is None:
+            queue_size = 2 * (max_workers + max_processes)
+
+        self._thread_pool = futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='mistral-action'
+        )
+
+        self._process_pool = (
+            futures.ProcessPoolExecutor(max_workers=max_processes)
+            if max_processes else None
+        )
+
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._timeout = timeout
+        self._deadlines = _DeadlineWatcher()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def submit(self, action_desc, params, context=None, wf_ctx=None,
+               timeout=None):
+        """Submits an action for running.
+
+        Blocks if the number of pending actions has reached the limit.
+
+        :param action_desc: Action descriptor.
+        :param params: Action parameters as a dictionary.
+        :param context: Action context passed to the method run().
+        :param wf_ctx: Workflow context passed to the descriptor.
+        :param timeout: Number of seconds given to the action to complete.
+            Overrides the default timeout of the runner.
+        :return: A future that resolves into an instance of Result,
+            or None if the action is asynchronous.
+        """
+
+        timeout = self._timeout if timeout is None else timeout
+
+        res_future = _ResultFuture(
+            time.monotonic() + timeout if timeout is not None else None
+        )
+
+        # Give up if no slot is released before the deadline.
+        if not self._slots.acquire(timeout=timeout):
+            res_future.action = action_desc.name
+            res_future.expire()
+
+            return res_future
+
+        try:
+            action = action_desc.instantiate(params, wf_ctx)
+        except Exception as e:
+            self._slots.release()
+
+            LOG.warning(
+                "Failed to instantiate an action [action_desc=%s]",
+                action_desc,
+                exc_info=True
+            )
+
+            res_future.set_result(
+                action_desc.post_process_result(
+                    _error_result(action_desc.name, e)
+                )
+            )
+
+            return res_future
+
+        res_future.action = action
+
+        try:
+            if self._process_pool and _is_cpu_bound(action):
+                serializer = serialization.get_polymorphic_serializer()
+
+                future = self._process_pool.submit(
+                    _run_serialized_action,
+                    serializer.serialize(action),
+                    serializer.serialize(context)
+                )
+
+                convert = serializer.deserialize
+            else:
+                future = self._thread_pool.submit(_run_action, action, context)
+
+                convert = None
+        except Exception:
+            self._slots.release()
+
+            raise
+
+        # NOTE: The slot is held until the action really completes, even
+        # if it times out, so that hung actions can't be replaced with
+        # new ones queueing behind them.
+        future.add_done_callback(lambda f: self._slots.release())
+
+        def _on_done(f):
+            if res_future.done():
+                # Already timed out.
+                return
+
+            try:
+                result = f.result()
+
+                if convert:
+                    result = convert(result)
+
+                if result is not None:
+                    result = action_desc.post_process_result(result)
+            except Exception as e:
+                result = action_desc.post_process_result(
+                    _error_result(action, e)
+                )
+
+            try:
+                res_future.set_result(result)
+            except futures.InvalidStateError:
+                pass
+
+        future.add_done_callback(_on_done)
+
+        if res_future.deadline is not None:
+            self._deadlines.watch(res_future)
+
+        return res_future
+
+    def get_result(self, future):
+        """Waits for the result of the submitted action.
+
+        If the action doesn't complete within its timeout the method
+        returns an error result. Note that a running thread can't be
+        interrupted so the action keeps running in the background, its
+        result will be ignored though.
+
+        :param future: A future returned by the method submit().
+        :return: An instance of Result or None for asynchronous actions.
+        """
+
+        wait_time = (
+            max(0, future.deadline - time.monotonic())
+            if future.deadline is not None else None
+        )
+
+        try:
+            return future.result(wait_time)
+        except futures.TimeoutError:
+            pass
+
+        # The deadline watcher may not have expired the future yet.
+        future.expire()
+
+        return future.result()
+
+    def run(self, action_desc, params, context=None, wf_ctx=None,
+            timeout=None):
+        """Runs the action and waits for its result.
+
+        :return: An instance of Result or None for asynchronous actions.
+        """
+
+        return self.get_result(
+            self.submit(action_desc, params, context, wf_ctx, timeout)
+        )
+
+    def run_batch(self, action_desc, inputs, contexts, wf_ctx=None,
+                  timeout=None):
+        """Runs a batch of actions with the given inputs and waits for them.
+
+        The batch is instantiated via the descriptor at once.
+        If the actions implement BatchAction, the instantiated actions are
+        passed to the method run_batch() of the action class. Otherwise
+        the actions run one by one. The batch occupies one slot of the
+        queue and the timeout applies to the whole batch.
+
+        :param action_desc: Action descriptor.
+        :param inputs: A list of action parameter dictionaries.
+        :param contexts: A list of action contexts, one per input.
+        :param wf_ctx: Workflow context passed to the descriptor.
+        :param timeout: Number of seconds given to the batch to complete.
+        :return: A list of results, one per input.
+        """
+
+        if len(contexts) != len(inputs):
+            raise ValueError(
+                "Number of contexts doesn't match number of inputs"
+                " [inputs=%s, contexts=%s]" % (len(inputs), len(contexts))
+            )
+
+        if not inputs:
+            return []
+
+        timeout = self._timeout if timeout is None else timeout
+
+        if not self._slots.acquire(timeout=timeout):
+            return [_timeout_result(action_desc.name) for _ in inputs]
+
+        try:
+            actions = action_desc.instantiate_batch(inputs, wf_ctx)
+        except Exception as e:
+            self._slots.release()
+
+            LOG.warning(
+                "Failed to instantiate a batch of actions"
+                " [action_desc=%s]",
+                action_desc,
+                exc_info=True
+            )
+
+            results = [_error_result(action_desc.name, e) for _ in inputs]
+        else:
+            try:
+                future = self._thread_pool.submit(
+                    _run_batch,
+                    actions,
+                    contexts
+                )
+            except Exception:
+                self._slots.release()
+
+                raise
+
+            # The slot is held until the batch really completes.
+            future.add_done_callback(lambda f: self._slots.release())
+
+            try:
+                results = future.result(timeout)
+            except futures.TimeoutError:
+                results = [_timeout_result(a) for a in actions]
+
+        return [
+            action_desc.post_process_result(r) if r is not None else None
+            for r in results
+        ]
+
+    def iter_results(self, items, batch_size=100):
+        """Runs the given actions and returns their results in batches.
+
+        Actions are submitted as long as there are free slots in the
+        queue so the method can be used with an arbitrarily long lazy
+        sequence of actions.
+
+        :param items: An iterable of tuples (action_desc, params, context).
+        :param batch_size: Maximum number of results in one batch.
+        :return: A generator of lists of results. The results keep the
+            order of the given items.
+        """
+
+        pending = []
+
+        for action_desc, params, context in items:
+            pending.append(self.submit(action_desc, params, context))
+
+            if len(pending) >= batch_size:
+                yield [self.get_result(f) for f in pending]
+
+                pending = []
+
+        if pending:
+            yield [self.get_result(f) for f in pending]
+
+    def shutdown(self, wait=True):
+        self._deadlines.stop()
+        self._thread_pool.shutdown(wait=wait)
+
+        if self._process_pool:
+            self._process_pool.shutdown(wait=wait)
@@ -14,18 +14,155 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import collections.abc
+
+from mistral_lib import exceptions as exc
 from mistral_lib import serialization
 from mistral_lib import utils
 
 
+class _BlobRef(object):
+    """Reference to result data offloaded to a blob storage."""
+
+    def __init__(self, storage, key, loaded=False):
+        self.storage = storage
+        self.key = key
+        self.loaded = loaded
+
+    def load(self):
+        return serialization.loads(self.storage.get(self.key))
+
+
+# Frozen variants of result classes, see Result.freeze().
+_frozen_classes = {}
+
+
+def _get_frozen_class(cls):
+    frozen_cls = _frozen_classes.get(cls)
+
+    if frozen_cls is None:
+        frozen_cls = type(
+            cls.__name__,
+            (_FrozenResultMixin, cls),
+            {'__slots__': (), '__module__': cls.__module__}
+        )
+
+        _frozen_classes[cls] = frozen_cls
+
+    return frozen_cls
+
+
+def _get_value_hash(value):
+    # NOTE: Values equal in Python must have equal hashes so containers
+    # are hashed by their items in a way independent of their types
+    # (e.g. a dict and a mapping with the same items are equal) and
+    # scalars are hashed natively (e.g. hash(1) == hash(1.0)).
+    if isinstance(value, collections.abc.Mapping):
+        return hash(frozenset(
+            (k, _get_value_hash(v)) for k, v in value.items()
+        ))
+
+    if isinstance(value, (list, tuple)):
+        return hash(tuple(_get_value_hash(v) for v in value))
+
+    if isinstance(value, (set, frozenset)):
+        return hash(frozenset(value))
+
+    try:
+        return hash(value)
+    except TypeError:
+        # Unhashable objects of other types all get the same hash.
+        return 0
+
+
+def _restore_frozen_result(cls, state):
+    result = cls.__new__(cls)
+
+    for name, value in state.items():
+        setattr(result, name, value)
+
+    return result.freeze()
+
+
 class Result(serialization.MistralSerializable):
-    """Action result."""
+    """Action result.
+
+    A result can be frozen with the method freeze(). A frozen result
+    can't be modified anymore and it becomes hashable. Its data must
+    not be modified in place either.
+    """
+
+    __slots__ = (
+        '_data', '_data_ref', 'error', 'cancel', '_content_hash', '_hash'
+    )
+
+    frozen = False
 
     def __init__(self, data=None, error=None, cancel=False):
+        self._content_hash = None
+        self._hash = None
         self.data = data
         self.error = error
         self.cancel = cancel
 
+    @property
+    def data(self):
+        # Data offloaded to a blob storage is loaded on first access.
+        # The reference is kept so that the data isn't written again
+        # if the result is serialized once more.
+        ref = self._data_ref
+
+        if ref is not None and not ref.loaded:
+            # Bypass __setattr__() of frozen results since loading
+            # doesn't change the value.
+            object.__setattr__(self, '_data', ref.load())
+
+            ref.loaded = True
+
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._data_ref = None
+
+    def freeze(self):
+        """Makes the result immutable and hashable.
+
+        :return: The result itself.
+        """
+
+        # NOTE: The class of the result is replaced with its frozen
+        # variant so that mutable results don't pay for the check in
+        # __setattr__().
+        if not self.frozen:
+            self.__class__ = _get_frozen_class(type(self))
+
+        return self
+
+    @property
+    def content_hash(self):
+        """Digest of the result content in JSON.
+
+        Results with equal content have the same digest. The digest of
+        a frozen result is calculated only once. Note that the digest is
+        calculated from JSON so results that only differ in ways lost in
+        JSON (e.g. 1 and '1' as dictionary keys) have the same digest.
+        It must not be used instead of comparing results.
+        """
+
+        if self._content_hash is not None:
+            return self._content_hash
+
+        digest, _ = serialization.get_content_digest(
+            [self.data, self.error, self.cancel]
+        )
+
+        if self.frozen:
+            object.__setattr__(self, '_content_hash', digest)
+
+        return digest
+
     def __repr__(self):
         return 'Result [data=%s, error=%s, cancel=%s]' % (
             repr(self.data), repr(self.error), str(self.cancel)
@@ -50,33 +187,345 @@ class Result(serialization.MistralSerializable):
         return not self.is_error() and not self.is_cancel()
 
     def __eq__(self, other):
-        return (
-            self.data == other.data and
-            self.error == other.error and
-            self.cancel == other.cancel
-        )
+        if self is other:
+            return True
+
+        if not isinstance(other, Result):
+            return False
+
+        # Compare cheap fields first.
+        if self.cancel != other.cancel or self.error != other.error:
+            return False
+
+        ref, other_ref = self._data_ref, other._data_ref
+
+        if (ref is not None and other_ref is not None and
+                ref.storage is other_ref.storage and ref.key == other_ref.key):
+            # The same offloaded data, no need to load it.
+            return True
+
+        return self.data == other.data
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    # Only frozen results are hashable.
+    __hash__ = None
+
     def to_dict(self):
         return {'result': self.data if self.is_success() else self.error}
 
+    def estimate_size(self, limit=None):
+        """Estimates the size of the result data and error in JSON.
+
+        :param limit: Optional. If the size exceeds the limit the
+            estimation stops and returns a value greater than the limit.
+        :return: Number of characters.
+        """
+
+        size = utils.estimate_serialized_size(self.data, limit)
+
+        if limit is not None:
+            if size > limit:
+                return size
+
+            limit -= size
+
+        return size + utils.estimate_serialized_size(self.error, limit)
+
+
+class _FrozenResultMixin(object):
+    __slots__ = ()
+
+    frozen = True
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Frozen result can't be modified: %s" % name)
+
+    def __delattr__(self, name):
+        raise AttributeError("Frozen result can't be modified: %s" % name)
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(
+                self,
+                '_hash',
+                _get_value_hash((self.data, self.error, self.cancel))
+            )
+
+        return self._hash
+
+    def __reduce__(self):
+        # The frozen class is dynamic so the result is restored as an
+        # instance of the original class and frozen again.
+        cls = type(self).__mro__[2]
+
+        state = {
+            name: getattr(self, name) for name in Result.__slots__
+        }
+        state.update(getattr(self, '__dict__', {}))
+
+        return _restore_frozen_result, (cls, state)
+
+    @classmethod
+    def get_serialization_key(cls):
+        # Frozen results are serialized as their original class.
+        return cls.__mro__[2].get_serialization_key()
+
 
 class ResultSerializer(serialization.DictBasedSerializer):
+    """Result serializer.
+
+    If a blob storage is given, result data whose size in JSON exceeds
+    the threshold is written to the storage and only its key is put
+    into the serialized result. Data of a deserialized result is then
+    loaded from the storage only when it's accessed. If such a result
+    is serialized again before its data is accessed, the data isn't
+    loaded at all and the same key is passed further. The same happens
+    when a result is serialized more than once, its data is written to
+    the storage only the first time. So the data of a result must not
+    be modified in place after serialization, a new value must be
+    assigned instead. Both sides must be configured with the same
+    storage.
+
+    The serializer never deletes anything from the storage. Stored data
+    belongs to whoever persists serialized results (e.g. the Mistral
+    engine), which must call BlobStorage.delete() with the key found
+    under "data_ref" when the result is deleted.
+
+    If "max_size" is given, the serializer refuses to serialize results
+    whose data and error are bigger than that in JSON, unless the data
+    is offloaded to the blob storage. The check is done before the
+    serialization and stops as soon as the limit is exceeded.
+    """
+
+    def __init__(self, blob_storage=None, threshold=1024 * 1024,
+                 max_size=None):
+        self._blob_storage = blob_storage
+        self._threshold = threshold
+        self._max_size = max_size
+
     def serialize_to_dict(self, entity):
-        return {
-            'data': entity.data,
+        res = {
             'error': entity.error,
             'cancel': entity.cancel
         }
 
+        data_ref = entity._data_ref
+
+        if data_ref is not None and data_ref.storage is self._blob_storage:
+            res['data_ref'] = data_ref.key
+
+            return res
+
+        data = entity.data
+
+        if (self._blob_storage is not None and
+                utils.estimate_serialized_size(data, self._threshold) >=
+                self._threshold):
+            key = self._blob_storage.put(
+                serialization.dumps(data).encode('utf-8')
+            )
+
+            # Remember the key so that the data is written only once.
+            # Bypass __setattr__() of frozen results since the value
+            # doesn't change.
+            object.__setattr__(
+                entity,
+                '_data_ref',
+                _BlobRef(self._blob_storage, key, loaded=True)
+            )
+
+            res['data_ref'] = key
+
+            return res
+
+        if self._max_size is not None:
+            size = entity.estimate_size(self._max_size)
+
+            if size > self._max_size:
+                raise exc.SizeLimitExceededException(
+                    "Result size exceeds the limit [limit=%s]" %
+                    self._max_size
+                )
+
+        res['data'] = data
+
+        return res
+
     def deserialize_from_dict(self, entity_dict):
-        return Result(
-            entity_dict['data'],
+        result = Result(
+            entity_dict.get('data'),
             entity_dict['error'],
             entity_dict.get('cancel', False)
         )
 
+        data_ref = entity_dict.get('data_ref')
+
+        if data_ref is not None:
+            if self._blob_storage is None:
+                raise RuntimeError(
+                    "Failed to load result data, the serializer is not"
+                    " configured with a blob storage: %s" % data_ref
+                )
+
+            result._data_ref = _BlobRef(self._blob_storage, data_ref)
+
+        return result
+
 
 serialization.register_serializer(Result, ResultSerializer())
+
+
+class ResultBatch(serialization.MistralSerializable):
+    """A compact container of many action results.
+
+    Statuses of the results are kept in one byte array so that they can be
+    counted and searched without touching individual results. Results are
+    only created when they're read from the batch. The batch is serialized
+    as a whole.
+    """
+
+    __slots__ = ('_data', '_errors', '_statuses')
+
+    SUCCESS = ord('S')
+    ERROR = ord('E')
+    CANCEL = ord('C')
+
+    def __init__(self, results=()):
+        self._data = []
+        # Errors are rare so they are kept in a dictionary by index.
+        self._errors = {}
+        self._statuses = bytearray()
+
+        self.extend(results)
+
+    @staticmethod
+    def _get_status(result):
+        if result.cancel:
+            return ResultBatch.CANCEL
+
+        if result.error is not None:
+            return ResultBatch.ERROR
+
+        return ResultBatch.SUCCESS
+
+    def append(self, result):
+        if result.error is not None:
+            self._errors[len(self._data)] = result.error
+
+        self._data.append(result.data)
+        self._statuses.append(self._get_status(result))
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self._statuses)
+
+        if not 0 <= idx < len(self._statuses):
+            raise IndexError('Result batch index out of range')
+
+        return Result(
+            self._data[idx],
+            self._errors.get(idx),
+            self._statuses[idx] == self.CANCEL
+        )
+
+    def __iter__(self):
+        for idx in range(len(self._statuses)):
+            yield self[idx]
+
+    def __eq__(self, other):
+        if not isinstance(other, ResultBatch):
+            return False
+
+        return (
+            self._statuses == other._statuses and
+            self._errors == other._errors and
+            self._data == other._data
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'ResultBatch [size=%s, errors=%s, cancelled=%s]' % (
+            len(self),
+            self.count(self.ERROR),
+            self.count(self.CANCEL)
+        )
+
+    def get_status(self, idx):
+        return self._statuses[idx]
+
+    def count(self, status):
+        """Returns the number of results with the given status."""
+
+        return self._statuses.count(status)
+
+    def find(self, status):
+        """Returns the index of the first result with the given status.
+
+        :return: Index or -1 if there's no such result.
+        """
+
+        return self._statuses.find(status)
+
+    def get_indexes(self, status):
+        """Returns indexes of all results with the given status."""
+
+        statuses = self._statuses
+
+        if statuses.count(status) * 8 > len(statuses):
+            return [i for i, s in enumerate(statuses) if s == status]
+
+        # Searching is faster for rare statuses, e.g. errors.
+        res = []
+
+        idx = statuses.find(status)
+
+        while idx >= 0:
+            res.append(idx)
+
+            idx = statuses.find(status, idx + 1)
+
+        return res
+
+    def get_results(self, status):
+        """Returns all results with the given status."""
+
+        return [self[idx] for idx in self.get_indexes(status)]
+
+    def has_errors(self):
+        return self.ERROR in self._statuses
+
+    def is_success(self):
+        return self._statuses.count(self.SUCCESS) == len(self._statuses)
+
+
+class ResultBatchSerializer(serialization.DictBasedSerializer):
+    def serialize_to_dict(self, entity):
+        return {
+            'data': entity._data,
+            # JSON objects only have string keys.
+            'errors': {str(k): v for k, v in entity._errors.items()},
+            'statuses': entity._statuses.decode('ascii')
+        }
+
+    def deserialize_from_dict(self, entity_dict):
+        batch = ResultBatch()
+
+        batch._data = entity_dict['data']
+        batch._errors = {int(k): v for k, v in entity_dict['errors'].items()}
+        batch._statuses = bytearray(entity_dict['statuses'], 'ascii')
+
+        return batch
+
+
+serialization.register_serializer(ResultBatch, ResultBatchSerializer())
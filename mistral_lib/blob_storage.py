@@ -0,0 +1,115 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import abc
+import mmap
+import os
+import tempfile
+
+from mistral_lib import utils
+
+
+class BlobStorage(abc.ABC):
+    """Storage of big binary objects.
+
+    It allows to pass big payloads out of band, following the "claim
+    check" pattern. A payload is written to the storage once and only
+    a small key referencing it travels through RPC and gets stored into
+    the database. The payload is read from the storage only when it's
+    really needed. So the storage must be accessible by all parties
+    exchanging the keys.
+    """
+
+    @abc.abstractmethod
+    def put(self, data):
+        """Stores the given payload.
+
+        :param data: Payload as bytes.
+        :return: A string key of the stored payload.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Reads the payload.
+
+        :param key: Key of the payload.
+        :return: A bytes-like object with the payload.
+        :raises KeyError: If the payload is not found.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Deletes the payload if it exists.
+
+        :param key: Key of the payload.
+        """
+        raise NotImplementedError
+
+
+class FileBlobStorage(BlobStorage):
+    """Blob storage keeping payloads in files of a local directory.
+
+    Payloads are read via memory mapping so the operating system page
+    cache is used instead of copying files into the process memory.
+    The directory can be shared by processes running on the same host
+    or placed on a shared file system.
+    """
+
+    def __init__(self, directory):
+        self._directory = directory
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, key):
+        if not utils.is_valid_uuid(key):
+            raise KeyError(key)
+
+        return os.path.join(self._directory, key)
+
+    def put(self, data):
+        key = utils.generate_unicode_uuid()
+
+        # Write into a temporary file first so that readers never see
+        # a partially written payload.
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory)
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+
+            os.replace(tmp_path, self._get_path(key))
+        except Exception:
+            os.remove(tmp_path)
+
+            raise
+
+        return key
+
+    def get(self, key):
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    # Empty files can't be mapped.
+                    return b''
+
+                # The mapping stays valid after the file is closed.
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def delete(self, key):
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError:
+            pass
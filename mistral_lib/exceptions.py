@@ -79,3 +79,7 @@ class MistralException(Exception):
 
 class ActionException(MistralException):
     message = "Failed to process an action"
+
+
+class SizeLimitExceededException(MistralException):
+    message = "Size limit exceeded"
@@ -13,11 +13,207 @@
 #    under the License.
 
 import abc
+import base64
+import collections
+import collections.abc
+import functools
+import hashlib
+import lzma
+import threading
+import time
+import weakref
+import zlib
 
 from oslo_serialization import jsonutils
 
 
 _SERIALIZER = None
+_SERIALIZER_LOCK = threading.Lock()
+
+_CODEC_KEY = '__serial_codec'
+_DATA_KEY = '__serial_data'
+
+# {codec name: (compress function, decompress function)}
+_CODECS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+_to_primitive = functools.partial(
+    jsonutils.to_primitive,
+    convert_instances=True
+)
+
+
+def _default(value):
+    # NOTE: Custom mappings are converted into dicts one level at a time
+    # so that they're not subject to the depth limit of to_primitive().
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value.items())
+
+    return _to_primitive(value)
+
+
+def dumps(obj):
+    """Converts the given object graph into a JSON string.
+
+    The result is the same as for dumping the result of
+    "jsonutils.to_primitive(obj, convert_instances=True)" but values
+    that are already JSON primitives are not traversed twice. The
+    conversion is applied only to those nodes that the JSON encoder
+    can't handle on its own. If the encoder fails anyway (e.g. because
+    of a dictionary key of an unsupported type) the method falls back
+    to the full conversion.
+
+    :param obj: Object to convert.
+    :return: JSON string.
+    """
+
+    try:
+        return jsonutils.dumps(obj, default=_default)
+    except TypeError:
+        return jsonutils.dumps(_to_primitive(obj))
+
+
+def loads(data):
+    """Converts the given JSON into an object.
+
+    Besides strings, the method accepts any bytes-like object with UTF-8
+    encoded JSON, such as bytes, bytearray, memoryview or mmap. The text
+    is decoded right from the buffer of such an object, so there's no
+    intermediate copy of the whole payload as a bytes object. This is
+    important for big payloads read from memory mapped files.
+
+    :param data: A string or a bytes-like object.
+    :return: Deserialized object.
+    """
+
+    if not isinstance(data, str):
+        data = str(data, 'utf-8')
+
+    return jsonutils.loads(data)
+
+
+def register_codec(name, compress, decompress):
+    """Registers a compression codec.
+
+    :param name: Codec name that is recorded into compressed payloads.
+    :param compress: A function converting bytes into compressed bytes.
+    :param decompress: A function converting compressed bytes back.
+    """
+
+    _CODECS[name] = (compress, decompress)
+
+
+class Compression(object):
+    """Compression settings of a serializer.
+
+    Payloads whose serialized size is less than the threshold are left
+    untouched so small messages don't pay anything for compression.
+    Bigger ones are compressed with the given codec and wrapped into an
+    envelope that records the codec name, so the receiving side doesn't
+    need to be configured to decompress them.
+    """
+
+    def __init__(self, codec='zlib', threshold=4096):
+        """Creates compression settings.
+
+        :param codec: Name of a registered codec.
+        :param threshold: Minimum number of characters in a serialized
+            payload that makes it compressed.
+        """
+
+        if codec not in _CODECS:
+            raise ValueError("Unknown compression codec: %s" % codec)
+
+        self.codec = codec
+        self.threshold = threshold
+
+    def compress(self, data_str):
+        """Compresses the serialized payload if it's big enough.
+
+        The payload is left untouched if it's less than the threshold
+        or if compressing doesn't make it smaller.
+
+        :param data_str: Serialized payload.
+        :return: The same payload or a compressed payload envelope.
+        """
+
+        if data_str is None or len(data_str) < self.threshold:
+            return data_str
+
+        envelope_str = self.wrap(data_str)
+
+        if len(envelope_str) >= len(data_str):
+            return data_str
+
+        return envelope_str
+
+    def wrap(self, data_str):
+        """Compresses the serialized payload regardless of its size.
+
+        :param data_str: Serialized payload.
+        :return: A compressed payload envelope.
+        """
+
+        compress = _CODECS[self.codec][0]
+
+        data = compress(data_str.encode('utf-8'))
+
+        return jsonutils.dumps({
+            _CODEC_KEY: self.codec,
+            _DATA_KEY: base64.b64encode(data).decode('ascii')
+        })
+
+
+_DEFAULT_COMPRESSION = Compression()
+
+
+def _is_compressed(data):
+    return (
+        isinstance(data, collections.abc.Mapping) and
+        len(data) == 2 and
+        _CODEC_KEY in data and
+        _DATA_KEY in data
+    )
+
+
+def _compress(compression, obj, data_str):
+    """Compresses the serialized object according to the settings.
+
+    :param compression: Compression settings or None.
+    :param obj: The object before serialization.
+    :param data_str: Serialized object.
+    :return: Serialized payload.
+    """
+
+    if data_str is not None and _is_compressed(obj):
+        # NOTE: An object that looks like a compressed payload envelope
+        # is always wrapped into a real one. Otherwise, it would be taken
+        # for an envelope on the receiving side.
+        return (compression or _DEFAULT_COMPRESSION).wrap(data_str)
+
+    if compression:
+        return compression.compress(data_str)
+
+    return data_str
+
+
+def _decompress(data):
+    """Decompresses the payload of the given parsed envelope.
+
+    :param data: Dictionary parsed from a compressed payload envelope.
+    :return: Decompressed serialized payload.
+    """
+
+    codec = data[_CODEC_KEY]
+
+    if codec not in _CODECS:
+        raise RuntimeError("Unknown compression codec: %s" % codec)
+
+    decompress = _CODECS[codec][1]
+
+    return decompress(base64.b64decode(data[_DATA_KEY])).decode('utf-8')
 
 
 class Serializer(object):
@@ -42,7 +238,8 @@ class Serializer(object):
         """Converts the given string into an object.
 
         :param data_str: String containing the state of the object in
-            serialized form.
+            serialized form. Serializers may also accept bytes-like
+            objects with UTF-8 encoded data.
         :return: An object.
         """
         raise NotImplementedError
@@ -58,23 +255,29 @@ class DictBasedSerializer(Serializer):
     bye the base serializer contract. Conversion into string is implemented
     once with regard to possible problems that may occur for collection and
     primitive types as circular dependencies, correct date format etc.
+
+    Big payloads can be compressed by assigning an instance of Compression
+    to the attribute "compression" of the serializer.
     """
 
+    compression = None
+
     def serialize(self, entity):
         if entity is None:
             return None
 
         entity_dict = self.serialize_to_dict(entity)
 
-        return jsonutils.dumps(
-            jsonutils.to_primitive(entity_dict, convert_instances=True)
-        )
+        return _compress(self.compression, entity_dict, dumps(entity_dict))
 
     def deserialize(self, data_str):
         if data_str is None:
             return None
 
-        entity_dict = jsonutils.loads(data_str)
+        entity_dict = loads(data_str)
+
+        if _is_compressed(entity_dict):
+            entity_dict = jsonutils.loads(_decompress(entity_dict))
 
         return self.deserialize_from_dict(entity_dict)
 
@@ -90,6 +293,9 @@ class DictBasedSerializer(Serializer):
 class MistralSerializable(object):
     """A mixin to generate a serialization key for a custom object."""
 
+    # Allow subclasses to be slotted.
+    __slots__ = ()
+
     @classmethod
     def get_serialization_key(cls):
         return "%s.%s" % (cls.__module__, cls.__name__)
@@ -110,12 +316,33 @@ class PolymorphicSerializer(Serializer):
     If a primitive value is given as an entity this serializer doesn't
     do anything special and simply converts a value into a string using
     jsonutils. Similar when it converts a string into a primitive value.
+
+    The registry of serializers is thread-safe. Modifications are
+    serialized with a lock and never change a dictionary that may be
+    being read by other threads, they replace it with an updated copy
+    instead. So serializing and deserializing don't need any locking.
+    Once all serializers are registered, the registry can be frozen
+    with the method freeze() so that it can't be modified anymore.
+
+    If compression settings are given, all payloads bigger than the
+    threshold, including primitive values, are compressed.
     """
 
-    def __init__(self):
+    def __init__(self, compression=None):
         # {serialization key: serializer}
+        # NOTE: This dictionary must never be modified in place.
         self.serializers = {}
 
+        self._lock = threading.Lock()
+        self._frozen = False
+
+        self.compression = compression
+
+        # {entity class: (serialization key, serializer)}
+        # The cache is weakly keyed so that dynamically created classes
+        # can still be garbage collected.
+        self._dispatch_cache = weakref.WeakKeyDictionary()
+
     @staticmethod
     def _get_serialization_key(entity_cls):
         if issubclass(entity_cls, MistralSerializable):
@@ -123,19 +350,69 @@ class PolymorphicSerializer(Serializer):
 
         return None
 
+    def _dispatch(self, entity_cls):
+        """Finds the serialization key and the serializer for the class.
+
+        :return: Tuple (serialization key, serializer). Both are None
+            if the class is not serializable by a custom serializer.
+        """
+
+        # NOTE: The cache must be read before the serializers. Writers
+        # replace them in the reverse order so that a result calculated
+        # from the old serializers never gets into the new cache.
+        cache = self._dispatch_cache
+
+        try:
+            return cache[entity_cls]
+        except KeyError:
+            pass
+
+        key = self._get_serialization_key(entity_cls)
+
+        res = (key, self.serializers.get(key) if key else None)
+
+        cache[entity_cls] = res
+
+        return res
+
+    def _invalidate_dispatch_cache(self):
+        self._dispatch_cache = weakref.WeakKeyDictionary()
+
+    def _update_serializers(self, func):
+        """Applies the given function to a copy of the registry.
+
+        :param func: A function that modifies the given dictionary.
+        """
+
+        with self._lock:
+            if self._frozen:
+                raise RuntimeError(
+                    "The serializer registry is frozen and can't be modified."
+                )
+
+            serializers = dict(self.serializers)
+
+            func(serializers)
+
+            self.serializers = serializers
+            self._invalidate_dispatch_cache()
+
     def register(self, entity_cls, serializer):
         key = self._get_serialization_key(entity_cls)
 
         if not key:
             return
 
-        if key in self.serializers:
-            raise RuntimeError(
-                "A serializer for the entity class has already been"
-                " registered: %s" % entity_cls
-            )
+        def _register(serializers):
+            if key in serializers:
+                raise RuntimeError(
+                    "A serializer for the entity class has already been"
+                    " registered: %s" % entity_cls
+                )
+
+            serializers[key] = serializer
 
-        self.serializers[key] = serializer
+        self._update_serializers(_register)
 
     def unregister(self, entity_cls):
         key = self._get_serialization_key(entity_cls)
@@ -143,25 +420,37 @@ class PolymorphicSerializer(Serializer):
         if not key:
             return
 
-        if key in self.serializers:
-            del self.serializers[key]
+        self._update_serializers(lambda s: s.pop(key, None))
 
     def cleanup(self):
-        self.serializers.clear()
+        self._update_serializers(lambda s: s.clear())
+
+    def freeze(self):
+        """Makes the registry of serializers immutable.
+
+        After this call any attempt to register or unregister a
+        serializer raises RuntimeError.
+        """
+
+        with self._lock:
+            self._frozen = True
+
+    @property
+    def frozen(self):
+        return self._frozen
 
     def serialize(self, entity):
         if entity is None:
             return None
 
-        key = self._get_serialization_key(type(entity))
+        return _compress(self.compression, entity, self._serialize(entity))
+
+    def _serialize(self, entity):
+        key, serializer = self._dispatch(type(entity))
 
         # Primitive or not registered type.
         if not key:
-            return jsonutils.dumps(
-                jsonutils.to_primitive(entity, convert_instances=True)
-            )
-
-        serializer = self.serializers.get(key)
+            return dumps(entity)
 
         if not serializer:
             raise RuntimeError(
@@ -179,7 +468,10 @@ class PolymorphicSerializer(Serializer):
         if data_str is None:
             return None
 
-        data = jsonutils.loads(data_str)
+        data = loads(data_str)
+
+        if _is_compressed(data):
+            data = jsonutils.loads(_decompress(data))
 
         if isinstance(data, dict) and '__serial_key' in data:
             serializer = self.serializers.get(data['__serial_key'])
@@ -189,11 +481,167 @@ class PolymorphicSerializer(Serializer):
         return data
 
 
+class ContentResolver(object):
+    """Storage of values addressed by digests of their content.
+
+    Serializers can use it to avoid sending big values that repeat from
+    one message to another. Instead of a value, a serializer sends its
+    digest and the receiving side fetches the value by the digest from
+    the storage shared with the sender (e.g. a database, a cache server
+    or a blob storage).
+    """
+
+    @abc.abstractmethod
+    def put(self, digest, value):
+        """Stores the value under the given digest.
+
+        :param digest: Digest of the value.
+        :param value: A value that can be converted to JSON.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get(self, digest):
+        """Fetches the value by its digest.
+
+        :param digest: Digest of the value.
+        :return: The value.
+        :raises KeyError: If the value is not found.
+        """
+        raise NotImplementedError
+
+
+class InMemoryContentResolver(ContentResolver):
+    """Content resolver keeping values in memory of the process.
+
+    Mostly useful for tests and for the cases when the sending and the
+    receiving sides live in the same process. Values are kept in JSON
+    so every call of get() returns a new copy of the value.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def put(self, digest, value):
+        self._values[digest] = jsonutils.dump_as_bytes(value)
+
+    def get(self, digest):
+        return jsonutils.loads(self._values[digest])
+
+
+def get_content_digest(value):
+    """Calculates the digest of the given value.
+
+    :param value: A value that can be converted to JSON.
+    :return: Tuple (digest, size of the value in JSON).
+    """
+
+    try:
+        data = jsonutils.dump_as_bytes(value, sort_keys=True)
+    except TypeError:
+        # Keys of different types (e.g. 1 and 'a') can't be sorted. JSON
+        # converts all keys into strings so the value is converted into
+        # JSON and back first.
+        data = jsonutils.dump_as_bytes(
+            jsonutils.loads(jsonutils.dumps(value)),
+            sort_keys=True
+        )
+
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+class ContentCache(object):
+    """Bounded local cache of content addressed values.
+
+    On the sending side the cache remembers digests of the recently
+    published values and publishes them to the resolver only once. If
+    the resolver may expire values, "republish_interval" must be set
+    to a number of seconds shorter than the resolver expiration time so
+    that values are published again before receivers can miss them.
+    On the receiving side the cache keeps recently resolved values so
+    that the resolver is called only if the value is not cached.
+
+    Values are cached in JSON and every call of get() returns a new copy
+    of the value so that modifying it in place affects neither the cache
+    nor other receivers of the same value.
+    """
+
+    def __init__(self, resolver, max_size=64, republish_interval=None):
+        self._resolver = resolver
+        self._max_size = max_size
+        self._republish_interval = republish_interval
+
+        # {digest: value in JSON}
+        self._values = collections.OrderedDict()
+
+        # {digest: time of publishing}
+        self._published = collections.OrderedDict()
+
+        self._lock = threading.Lock()
+
+    def _store(self, cache, key, value):
+        cache[key] = value
+
+        if len(cache) > self._max_size:
+            cache.popitem(last=False)
+
+    def get_digest(self, value):
+        """Returns the digest and the size of the value.
+
+        The digest is always calculated from the current content of the
+        value, so values modified in place get new digests.
+        """
+
+        return get_content_digest(value)
+
+    def put(self, digest, value):
+        """Caches the value and publishes it to the resolver if needed."""
+
+        now = time.monotonic()
+
+        with self._lock:
+            published = self._published.get(digest)
+
+            if published is not None and (
+                    self._republish_interval is None or
+                    now - published < self._republish_interval):
+                self._published.move_to_end(digest)
+
+                return
+
+        data = jsonutils.dump_as_bytes(value)
+
+        self._resolver.put(digest, value)
+
+        with self._lock:
+            self._store(self._published, digest, now)
+            self._store(self._values, digest, data)
+
+    def get(self, digest):
+        """Returns the value from the cache or from the resolver."""
+
+        with self._lock:
+            data = self._values.get(digest)
+
+            if data is not None:
+                self._values.move_to_end(digest)
+
+        if data is None:
+            data = jsonutils.dump_as_bytes(self._resolver.get(digest))
+
+            with self._lock:
+                self._store(self._values, digest, data)
+
+        return jsonutils.loads(data)
+
+
 def get_polymorphic_serializer():
     global _SERIALIZER
 
     if _SERIALIZER is None:
-        _SERIALIZER = PolymorphicSerializer()
+        with _SERIALIZER_LOCK:
+            if _SERIALIZER is None:
+                _SERIALIZER = PolymorphicSerializer()
 
     return _SERIALIZER
 
@@ -208,3 +656,7 @@ def unregister_serializer(entity_cls):
 
 def cleanup():
     get_polymorphic_serializer().cleanup()
+
+
+def freeze():
+    get_polymorphic_serializer().freeze()
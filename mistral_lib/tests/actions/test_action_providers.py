@@ -12,6 +12,7 @@
 
 from mistral_lib import actions
 from mistral_lib.actions.providers import python
+from mistral_lib import exceptions as exc
 from mistral_lib.tests import base as tests_base
 
 
@@ -28,6 +29,31 @@ class HelloAction(actions.Action):
         return 'Hello %s %s!' % (self._f_name, self._l_name)
 
 
+class TypedHelloAction(actions.Action):
+    def __init__(self, f_name: str, age: int = None):
+        super(TypedHelloAction, self).__init__()
+
+        self._f_name = f_name
+        self._age = age
+
+    def run(self, context):
+        return 'Hello %s!' % self._f_name
+
+
+class DefaultsAction(actions.Action):
+    def __init__(self, url, method="GET", headers={"Accept": "*/*"},
+                 timeout=None):
+        super(DefaultsAction, self).__init__()
+
+        self.url = url
+        self.method = method
+        self.headers = headers
+        self.timeout = timeout
+
+    def run(self, context):
+        return self.url
+
+
 class TestActionProvider(actions.ActionProvider):
     def __init__(self, name):
         super(TestActionProvider, self).__init__(name)
@@ -70,6 +96,114 @@ class TestActionProviders(tests_base.TestCase):
 
         self.assertEqual('Hello Jhon Doe!', res)
 
+    def test_python_action_descriptor_batch(self):
+        action_desc = python.PythonActionDescriptor(
+            'test_action',
+            HelloAction,
+            action_cls_attrs={'greeting': 'Hi'}
+        )
+
+        inputs = [
+            {'f_name': 'Jhon', 'l_name': 'Doe'},
+            {'f_name': 'Jane', 'l_name': 'Roe'}
+        ]
+
+        action_desc.check_parameters_batch(inputs)
+
+        actions_ = action_desc.instantiate_batch(inputs, {})
+
+        self.assertEqual(2, len(actions_))
+        self.assertIs(type(actions_[0]), type(actions_[1]))
+        self.assertEqual('Hi', actions_[0].greeting)
+        self.assertEqual('Hello Jane Roe!', actions_[1].run(None))
+
+        self.assertRaises(
+            exc.ActionException,
+            action_desc.check_parameters_batch,
+            inputs + [{'f_name': 'Jhon'}]
+        )
+
+    def test_python_action_descriptor_check_types(self):
+        action_desc = python.PythonActionDescriptor(
+            'test_action',
+            TypedHelloAction,
+            check_types=True
+        )
+
+        self.assertEqual(
+            {'f_name': (str,), 'age': (int, type(None))},
+            action_desc.params_schema
+        )
+
+        action_desc.check_parameters({'f_name': 'Jhon', 'age': 30})
+        action_desc.check_parameters({'f_name': 'Jhon', 'age': None})
+
+        e = self.assertRaises(
+            exc.ActionException,
+            action_desc.check_parameters,
+            {'f_name': 1, 'age': '30'}
+        )
+
+        self.assertIn("invalid_types=['f_name', 'age']", str(e))
+
+        self.assertRaises(
+            exc.ActionException,
+            action_desc.check_parameters_batch,
+            [{'f_name': 'Jhon'}, {'f_name': None}]
+        )
+
+    def test_python_action_descriptor_no_type_checks(self):
+        action_desc = python.PythonActionDescriptor(
+            'test_action',
+            TypedHelloAction
+        )
+
+        self.assertIsNone(action_desc.params_schema)
+
+        action_desc.check_parameters({'f_name': 1})
+
+    def test_resolve_input(self):
+        action_desc = python.PythonActionDescriptor(
+            'test_action',
+            DefaultsAction
+        )
+
+        input_1 = action_desc.resolve_input({'url': 'http://a'})
+
+        self.assertEqual(
+            {
+                'url': 'http://a',
+                'method': 'GET',
+                'headers': {'Accept': '*/*'},
+                'timeout': None
+            },
+            input_1
+        )
+
+        input_2 = action_desc.resolve_input(
+            {'url': 'http://b', 'method': 'POST'}
+        )
+
+        self.assertEqual('POST', input_2['method'])
+
+        # Mutable defaults are not shared.
+        self.assertIsNot(input_1['headers'], input_2['headers'])
+
+        action = action_desc.instantiate(input_1, {})
+
+        self.assertEqual({'Accept': '*/*'}, action.headers)
+
+        self.assertRaises(
+            exc.ActionException,
+            action_desc.resolve_input,
+            {'method': 'POST'}
+        )
+        self.assertRaises(
+            exc.ActionException,
+            action_desc.resolve_input,
+            {'url': 'http://a', 'wrong': 1}
+        )
+
     def test_composite_action_provider(self):
         # Check empty provider.
         composite_provider = actions.CompositeActionProvider('test', [])
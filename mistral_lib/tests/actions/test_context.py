@@ -10,7 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
+import warnings
+
 from mistral_lib.actions import context
+from mistral_lib import serialization
 from mistral_lib.tests import base as tests_base
 
 
@@ -71,6 +75,27 @@ class TestActionsBase(tests_base.TestCase):
 
             self.assertEqual(old, new)
 
+    def test_deprecated_properties_warning(self):
+        ctx = _fake_context()
+
+        context._warned_attrs.discard('auth_uri')
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+
+            ctx.auth_uri
+            ctx.auth_uri
+            ctx.security
+
+        self.assertEqual(1, len(w))
+        self.assertIs(DeprecationWarning, w[0].category)
+        self.assertIn('context.security.auth_uri', str(w[0].message))
+
+    def test_unknown_attribute(self):
+        ctx = _fake_context()
+
+        self.assertRaises(AttributeError, getattr, ctx, 'unknown')
+
 
 class TestActionContextSerializer(tests_base.TestCase):
 
@@ -81,8 +106,14 @@ class TestActionContextSerializer(tests_base.TestCase):
 
         dict_ctx = serialiser.serialize_to_dict(ctx)
 
-        self.assertEqual(dict_ctx['security'], vars(ctx.security))
-        self.assertEqual(dict_ctx['execution'], vars(ctx.execution))
+        self.assertEqual(dict_ctx['security'], ctx.security.to_dict())
+        self.assertEqual(dict_ctx['execution'], ctx.execution.to_dict())
+
+        security = dict_ctx['security']
+        execution = dict_ctx['execution']
+
+        self.assertEqual('service_catalog', security['service_catalog'])
+        self.assertEqual('workflow_name', execution['workflow_name'])
 
     def test_deserialization(self):
         ctx = _fake_context()
@@ -97,3 +128,133 @@ class TestActionContextSerializer(tests_base.TestCase):
             ctx.execution.workflow_name,
             ctx_2.execution.workflow_name
         )
+
+    def test_deserialization_does_not_share_security_context(self):
+        ctx = _fake_context()
+
+        serialiser = context.ActionContextSerializer()
+
+        dict_ctx = serialiser.serialize_to_dict(ctx)
+
+        ctx_1 = serialiser.deserialize_from_dict(dict_ctx)
+        ctx_2 = serialiser.deserialize_from_dict(dict_ctx)
+
+        self.assertIsNot(ctx_1.security, ctx_2.security)
+
+        ctx_1.security.auth_token = 'new_token'
+
+        self.assertEqual(ctx.security.auth_token, ctx_2.security.auth_token)
+
+    def test_deserialization_shares_security_context(self):
+        ctx = _fake_context()
+
+        serialiser = context.ActionContextSerializer(security_cache_size=16)
+
+        dict_ctx = serialiser.serialize_to_dict(ctx)
+
+        ctx_1 = serialiser.deserialize_from_dict(dict_ctx)
+        ctx_2 = serialiser.deserialize_from_dict(dict_ctx)
+
+        self.assertIs(ctx_1.security, ctx_2.security)
+        self.assertIsNot(ctx_1.execution, ctx_2.execution)
+
+        dict_ctx['security']['service_catalog'] = 'other_catalog'
+
+        ctx_3 = serialiser.deserialize_from_dict(dict_ctx)
+
+        self.assertIsNot(ctx_1.security, ctx_3.security)
+        self.assertEqual('other_catalog', ctx_3.security.service_catalog)
+
+        # Shared security contexts are read-only.
+        self.assertRaises(
+            AttributeError,
+            setattr,
+            ctx_1.security,
+            'auth_token',
+            'new_token'
+        )
+        self.assertIsInstance(ctx_1.security, context.SecurityContext)
+        self.assertEqual(
+            ctx.security.to_dict(),
+            ctx_2.security.to_dict()
+        )
+
+    def test_slots(self):
+        ctx = _fake_context()
+
+        self.assertFalse(hasattr(ctx, '__dict__'))
+        self.assertFalse(hasattr(ctx.security, '__dict__'))
+        self.assertFalse(hasattr(ctx.execution, '__dict__'))
+
+    def test_content_addressed_serialization(self):
+        ctx = _fake_context()
+        ctx.security.service_catalog = [
+            {'name': 'service%s' % i, 'url': 'http://host/%s' % i}
+            for i in range(100)
+        ]
+
+        resolver = serialization.InMemoryContentResolver()
+
+        sender = context.ActionContextSerializer(content_resolver=resolver)
+        receiver = context.ActionContextSerializer(content_resolver=resolver)
+
+        dict_ctx = sender.serialize_to_dict(ctx)
+
+        catalog_ref = dict_ctx['security']['service_catalog']
+
+        self.assertEqual(['__content_ref'], list(catalog_ref.keys()))
+        self.assertEqual(
+            ctx.security.service_catalog,
+            resolver.get(catalog_ref['__content_ref'])
+        )
+
+        # Small values are sent as is.
+        self.assertEqual('auth_uri', dict_ctx['security']['auth_uri'])
+
+        ctx_2 = receiver.deserialize(sender.serialize(ctx))
+
+        self.assertEqual(
+            ctx.security.service_catalog,
+            ctx_2.security.service_catalog
+        )
+        self.assertEqual(
+            ctx.execution.workflow_name,
+            ctx_2.execution.workflow_name
+        )
+
+        # Contexts don't share the catalog, neither on the receiving
+        # side nor with the sender.
+        catalog = copy.deepcopy(ctx.security.service_catalog)
+
+        ctx_3 = sender.deserialize(sender.serialize(ctx))
+
+        ctx_2.security.service_catalog.append({'name': 'other'})
+        ctx_3.security.service_catalog[0]['url'] = 'http://other'
+
+        ctx_4 = receiver.deserialize(sender.serialize(ctx))
+
+        self.assertEqual(catalog, ctx.security.service_catalog)
+        self.assertEqual(catalog, ctx_4.security.service_catalog)
+
+        # Without a resolver the reference can't be resolved.
+        self.assertRaises(
+            RuntimeError,
+            context.ActionContextSerializer().deserialize_from_dict,
+            dict_ctx
+        )
+
+    def test_content_addressed_serialization_small_catalog(self):
+        ctx = _fake_context()
+
+        resolver = serialization.InMemoryContentResolver()
+
+        serialiser = context.ActionContextSerializer(
+            content_resolver=resolver
+        )
+
+        dict_ctx = serialiser.serialize_to_dict(ctx)
+
+        self.assertEqual(
+            'service_catalog',
+            dict_ctx['security']['service_catalog']
+        )
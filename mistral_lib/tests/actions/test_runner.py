@@ -0,0 +1,406 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import threading
+import time
+
+from mistral_lib import actions
+from mistral_lib.actions.providers import python
+from mistral_lib import exceptions as exc
+from mistral_lib.tests import base as tests_base
+
+
+class EchoAction(actions.Action):
+    def __init__(self, value):
+        super(EchoAction, self).__init__()
+
+        self.value = value
+
+    def run(self, context):
+        return self.value
+
+
+class FailingAction(actions.Action):
+    def run(self, context):
+        raise exc.ActionException("Oops")
+
+
+class ErrorResultAction(actions.Action):
+    def run(self, context):
+        return actions.Result(error='Error')
+
+
+class AsyncAction(actions.Action):
+    def run(self, context):
+        return 'Ignored'
+
+    def is_sync(self):
+        return False
+
+
+class AsyncErrorResultAction(actions.Action):
+    def run(self, context):
+        return actions.Result(error='Error')
+
+    def is_sync(self):
+        return False
+
+
+class AsyncFailingAction(actions.Action):
+    def run(self, context):
+        raise exc.ActionException("Oops")
+
+    def is_sync(self):
+        return False
+
+
+class BlockingAction(actions.Action):
+    def __init__(self, event):
+        super(BlockingAction, self).__init__()
+
+        self.event = event
+
+    def run(self, context):
+        self.event.wait(5)
+
+        return 'Done'
+
+
+class CpuBoundAction(actions.Action):
+    cpu_bound = True
+
+    def run(self, context):
+        return os.getpid()
+
+
+class SumBatchAction(actions.BatchAction):
+    batch_calls = 0
+
+    def __init__(self, a, b):
+        super(SumBatchAction, self).__init__()
+
+        self.a = a
+        self.b = b
+
+    def run(self, context):
+        return self.a + self.b
+
+    @classmethod
+    def run_batch(cls, actions_, contexts):
+        SumBatchAction.batch_calls += 1
+
+        return [
+            actions.Result(error='Negative') if a.a < 0 else a.a + a.b
+            for a in actions_
+        ]
+
+
+class CountingBatchAction(actions.BatchAction):
+    instances = 0
+
+    def __init__(self, value):
+        super(CountingBatchAction, self).__init__()
+
+        CountingBatchAction.instances += 1
+
+        self.value = value
+
+    def run(self, context):
+        return self.value
+
+
+class PartlyFailingBatchAction(actions.BatchAction):
+    def __init__(self, value):
+        super(PartlyFailingBatchAction, self).__init__()
+
+        self.value = value
+
+    def run(self, context):
+        if self.value < 0:
+            raise ValueError("Negative")
+
+        return self.value
+
+
+class UpperCaseDescriptor(python.PythonActionDescriptor):
+    def post_process_result(self, result):
+        if result.data:
+            result.data = result.data.upper()
+
+        return result
+
+
+class ActionRunnerTest(tests_base.TestCase):
+    def setUp(self):
+        super(ActionRunnerTest, self).setUp()
+
+        self.runner = actions.ActionRunner(max_workers=2)
+
+        self.addCleanup(self.runner.shutdown)
+
+    def test_run(self):
+        action_desc = python.PythonActionDescriptor('echo', EchoAction)
+
+        result = self.runner.run(action_desc, {'value': 'abc'})
+
+        self.assertEqual(actions.Result(data='abc'), result)
+
+    def test_run_post_process_result(self):
+        action_desc = UpperCaseDescriptor('echo', EchoAction)
+
+        result = self.runner.run(action_desc, {'value': 'abc'})
+
+        self.assertEqual(actions.Result(data='ABC'), result)
+
+    def test_run_action_exception(self):
+        action_desc = python.PythonActionDescriptor('fail', FailingAction)
+
+        result = self.runner.run(action_desc, {})
+
+        self.assertTrue(result.is_error())
+        self.assertIn('Oops', result.error)
+
+    def test_run_error_result(self):
+        action_desc = python.PythonActionDescriptor(
+            'error',
+            ErrorResultAction
+        )
+
+        result = self.runner.run(action_desc, {})
+
+        self.assertEqual(actions.Result(error='Error'), result)
+
+    def test_run_invalid_params(self):
+        action_desc = python.PythonActionDescriptor('echo', EchoAction)
+
+        result = self.runner.run(action_desc, {'wrong': 'abc'})
+
+        self.assertTrue(result.is_error())
+
+    def test_run_async(self):
+        action_desc = python.PythonActionDescriptor('async', AsyncAction)
+
+        self.assertIsNone(self.runner.run(action_desc, {}))
+
+    def test_run_async_error(self):
+        action_desc = python.PythonActionDescriptor(
+            'async_error',
+            AsyncErrorResultAction
+        )
+
+        self.assertEqual(
+            actions.Result(error='Error'),
+            self.runner.run(action_desc, {})
+        )
+
+        action_desc = python.PythonActionDescriptor(
+            'async_failing',
+            AsyncFailingAction
+        )
+
+        result = self.runner.run(action_desc, {})
+
+        self.assertTrue(result.is_error())
+        self.assertIn('Oops', result.error)
+
+    def test_run_batch_async(self):
+        action_desc = python.PythonActionDescriptor(
+            'async_error',
+            AsyncErrorResultAction
+        )
+
+        results = self.runner.run_batch(action_desc, [{}], [None])
+
+        self.assertEqual([actions.Result(error='Error')], results)
+
+        action_desc = python.PythonActionDescriptor('async', AsyncAction)
+
+        results = self.runner.run_batch(action_desc, [{}, {}], [None, None])
+
+        self.assertEqual([None, None], results)
+
+    def test_run_timeout(self):
+        action_desc = python.PythonActionDescriptor(
+            'blocking',
+            BlockingAction
+        )
+
+        event = threading.Event()
+
+        self.addCleanup(event.set)
+
+        result = self.runner.run(action_desc, {'event': event}, timeout=0.1)
+
+        self.assertTrue(result.is_error())
+        self.assertIn('timed out', result.error)
+
+    def test_run_batch(self):
+        action_desc = python.PythonActionDescriptor('sum', SumBatchAction)
+
+        inputs = [{'a': i, 'b': 1} for i in range(-1, 3)]
+
+        SumBatchAction.batch_calls = 0
+
+        results = self.runner.run_batch(action_desc, inputs, [None] * 4)
+
+        self.assertEqual(1, SumBatchAction.batch_calls)
+        self.assertEqual(
+            [
+                actions.Result(error='Negative'),
+                actions.Result(data=1),
+                actions.Result(data=2),
+                actions.Result(data=3)
+            ],
+            results
+        )
+
+    def test_run_batch_default(self):
+        action_desc = python.PythonActionDescriptor('echo', EchoAction)
+
+        results = self.runner.run_batch(
+            action_desc,
+            [{'value': 'a'}, {'value': 'b'}],
+            [None, None]
+        )
+
+        self.assertEqual(['a', 'b'], [r.data for r in results])
+
+    def test_run_batch_invalid_params(self):
+        action_desc = python.PythonActionDescriptor('sum', SumBatchAction)
+
+        results = self.runner.run_batch(
+            action_desc,
+            [{'a': 1, 'b': 1}, {'a': 1}],
+            [None, None]
+        )
+
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(r.is_error() for r in results))
+
+    def test_run_batch_contexts_mismatch(self):
+        action_desc = python.PythonActionDescriptor('echo', EchoAction)
+
+        self.assertRaises(
+            ValueError,
+            self.runner.run_batch,
+            action_desc,
+            [{'value': 'a'}, {'value': 'b'}],
+            [None]
+        )
+
+    def test_run_batch_default_instantiates_once(self):
+        action_desc = python.PythonActionDescriptor(
+            'counting',
+            CountingBatchAction
+        )
+
+        CountingBatchAction.instances = 0
+
+        results = self.runner.run_batch(
+            action_desc,
+            [{'value': 1}, {'value': 2}],
+            [None, None]
+        )
+
+        self.assertEqual([1, 2], [r.data for r in results])
+        self.assertEqual(2, CountingBatchAction.instances)
+
+    def test_run_batch_default_item_error(self):
+        action_desc = python.PythonActionDescriptor(
+            'partly_failing',
+            PartlyFailingBatchAction
+        )
+
+        results = self.runner.run_batch(
+            action_desc,
+            [{'value': 1}, {'value': -1}],
+            [None, None]
+        )
+
+        self.assertEqual(
+            [actions.Result(data=1), actions.Result(error='Negative')],
+            results
+        )
+
+    def test_iter_results(self):
+        action_desc = python.PythonActionDescriptor('echo', EchoAction)
+
+        items = ((action_desc, {'value': i}, None) for i in range(25))
+
+        batches = list(self.runner.iter_results(items, batch_size=10))
+
+        self.assertEqual([10, 10, 5], [len(b) for b in batches])
+        self.assertEqual(
+            list(range(25)),
+            [r.data for b in batches for r in b]
+        )
+
+    def test_cpu_bound_action(self):
+        runner = actions.ActionRunner(max_workers=1, max_processes=1)
+
+        self.addCleanup(runner.shutdown)
+
+        action_desc = python.PythonActionDescriptor('cpu', CpuBoundAction)
+
+        result = runner.run(action_desc, {})
+
+        self.assertTrue(result.is_success())
+        self.assertNotEqual(os.getpid(), result.data)
+
+    def test_cpu_bound_action_without_process_pool(self):
+        action_desc = python.PythonActionDescriptor('cpu', CpuBoundAction)
+
+        result = self.runner.run(action_desc, {})
+
+        self.assertEqual(os.getpid(), result.data)
+
+    def test_iter_results_hanging_actions(self):
+        runner = actions.ActionRunner(max_workers=2, queue_size=2, timeout=0.5)
+
+        event = threading.Event()
+
+        self.addCleanup(runner.shutdown, wait=False)
+        self.addCleanup(event.set)
+
+        action_desc = python.PythonActionDescriptor(
+            'blocking',
+            BlockingAction
+        )
+
+        items = ((action_desc, {'event': event}, None) for _ in range(4))
+
+        start = time.monotonic()
+
+        batches = list(runner.iter_results(items, batch_size=100))
+
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(1, len(batches))
+        self.assertEqual(4, len(batches[0]))
+        self.assertTrue(all('timed out' in r.error for r in batches[0]))
+
+    def test_timeout_without_waiting(self):
+        action_desc = python.PythonActionDescriptor(
+            'blocking',
+            BlockingAction
+        )
+
+        event = threading.Event()
+
+        self.addCleanup(event.set)
+
+        future = self.runner.submit(action_desc, {'event': event}, timeout=0.1)
+
+        # The future is expired by the runner itself.
+        result = future.result(3)
+
+        self.assertIn('timed out', result.error)
@@ -0,0 +1,344 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import copy
+from unittest import mock
+
+import fixtures
+
+from mistral_lib.actions import types
+from mistral_lib import blob_storage
+from mistral_lib import exceptions as exc
+from mistral_lib import serialization
+from mistral_lib.tests import base as tests_base
+
+
+class TestResultSerializer(tests_base.TestCase):
+    def setUp(self):
+        super(TestResultSerializer, self).setUp()
+
+        directory = self.useFixture(fixtures.TempDir()).path
+
+        self.storage = blob_storage.FileBlobStorage(directory)
+
+    def test_serialization(self):
+        serializer = types.ResultSerializer()
+
+        result = types.Result(data={'a': 1}, error=None, cancel=True)
+
+        self.assertEqual(
+            {'data': {'a': 1}, 'error': None, 'cancel': True},
+            serializer.serialize_to_dict(result)
+        )
+
+        self.assertEqual(
+            result,
+            serializer.deserialize(serializer.serialize(result))
+        )
+
+    def test_blob_offloading(self):
+        serializer = types.ResultSerializer(self.storage, threshold=100)
+
+        data = ['value'] * 100
+
+        result_dict = serializer.serialize_to_dict(types.Result(data=data))
+
+        self.assertNotIn('data', result_dict)
+        self.assertIn('data_ref', result_dict)
+
+        with mock.patch.object(
+                self.storage, 'get', wraps=self.storage.get) as get_mock:
+            result = serializer.deserialize_from_dict(result_dict)
+
+            # Serializing the result again must not load the data.
+            self.assertEqual(
+                result_dict,
+                serializer.serialize_to_dict(result)
+            )
+
+            get_mock.assert_not_called()
+
+            self.assertEqual(data, result.data)
+            self.assertEqual(data, result.data)
+
+            get_mock.assert_called_once_with(result_dict['data_ref'])
+
+    def test_blob_offloading_written_once(self):
+        serializer = types.ResultSerializer(self.storage, threshold=100)
+
+        data = ['value'] * 100
+
+        result = types.Result(data=data)
+
+        with mock.patch.object(
+                self.storage, 'put', wraps=self.storage.put) as put_mock:
+            result_dicts = [
+                serializer.serialize_to_dict(result) for _ in range(3)
+            ]
+
+            put_mock.assert_called_once()
+
+            # Accessing the data doesn't make it written again.
+            self.assertEqual(data, result.data)
+
+            self.assertEqual(
+                result_dicts[0],
+                serializer.serialize_to_dict(result)
+            )
+
+            put_mock.assert_called_once()
+
+            # A new value is written.
+            result.data = ['other'] * 100
+
+            self.assertNotEqual(
+                result_dicts[0],
+                serializer.serialize_to_dict(result)
+            )
+
+            self.assertEqual(2, put_mock.call_count)
+
+        self.assertEqual([result_dicts[0]] * 3, result_dicts)
+
+        # Deserialized results share the key.
+        result = serializer.deserialize_from_dict(result_dicts[0])
+
+        self.assertEqual(data, result.data)
+        self.assertEqual(result_dicts[0], serializer.serialize_to_dict(result))
+
+    def test_blob_offloading_frozen(self):
+        serializer = types.ResultSerializer(self.storage, threshold=100)
+
+        result = types.Result(data=['value'] * 100).freeze()
+
+        self.assertEqual(
+            serializer.serialize_to_dict(result),
+            serializer.serialize_to_dict(result)
+        )
+
+    def test_blob_offloading_small_data(self):
+        serializer = types.ResultSerializer(self.storage, threshold=100)
+
+        result_dict = serializer.serialize_to_dict(types.Result(data='a'))
+
+        self.assertEqual('a', result_dict['data'])
+        self.assertNotIn('data_ref', result_dict)
+
+    def test_blob_offloading_not_configured(self):
+        serializer = types.ResultSerializer(self.storage, threshold=1)
+
+        result_dict = serializer.serialize_to_dict(types.Result(data='abc'))
+
+        self.assertRaises(
+            RuntimeError,
+            types.ResultSerializer().deserialize_from_dict,
+            result_dict
+        )
+
+    def test_max_size(self):
+        serializer = types.ResultSerializer(max_size=100)
+
+        serializer.serialize_to_dict(types.Result(data='a' * 90))
+
+        self.assertRaises(
+            exc.SizeLimitExceededException,
+            serializer.serialize_to_dict,
+            types.Result(data='a' * 101)
+        )
+        self.assertRaises(
+            exc.SizeLimitExceededException,
+            serializer.serialize_to_dict,
+            types.Result(data='a' * 50, error='e' * 50)
+        )
+
+    def test_max_size_scalar_subclasses(self):
+        class MyFloat(float):
+            pass
+
+        serializer = types.ResultSerializer(max_size=100)
+
+        result_dict = serializer.serialize_to_dict(
+            types.Result(data={'x': MyFloat(1.5)})
+        )
+
+        self.assertEqual({'x': 1.5}, result_dict['data'])
+
+    def test_max_size_with_blob_storage(self):
+        serializer = types.ResultSerializer(
+            self.storage,
+            threshold=100,
+            max_size=100
+        )
+
+        result_dict = serializer.serialize_to_dict(
+            types.Result(data='a' * 1000)
+        )
+
+        self.assertIn('data_ref', result_dict)
+
+
+class TestResult(tests_base.TestCase):
+    def test_estimate_size(self):
+        result = types.Result(data={'a': [1, 2]}, error='error')
+
+        self.assertEqual(
+            len('{"a": [1, 2]}') + len('"error"'),
+            result.estimate_size()
+        )
+
+        self.assertGreater(result.estimate_size(limit=5), 5)
+
+    def test_slots(self):
+        result = types.Result(data=1)
+
+        self.assertFalse(hasattr(result, '__dict__'))
+        self.assertRaises(AttributeError, setattr, result, 'unknown', 1)
+
+    def test_freeze(self):
+        result = types.Result(data={'a': 1})
+
+        self.assertRaises(TypeError, hash, result)
+
+        self.assertIs(result, result.freeze())
+        self.assertTrue(result.frozen)
+
+        self.assertRaises(AttributeError, setattr, result, 'data', 2)
+        self.assertRaises(AttributeError, setattr, result, 'error', 'Error')
+
+        same = types.Result(data={'a': 1}).freeze()
+
+        self.assertEqual(hash(result), hash(same))
+        self.assertEqual(1, len({result, same}))
+
+    def test_hash_consistent_with_equality(self):
+        def _check(data, other_data):
+            result = types.Result(data=data).freeze()
+            other = types.Result(data=other_data).freeze()
+
+            equal = data == other_data
+
+            self.assertEqual(equal, result == other)
+
+            if equal:
+                self.assertEqual(hash(result), hash(other))
+
+            # Hashing doesn't change the result of the comparison.
+            self.assertEqual(equal, result == other)
+
+        _check(1, 1.0)
+        _check({'a': [1, 2]}, {'a': [1.0, 2]})
+        _check({1: 'x'}, {'1': 'x'})
+        _check((1, 2), [1, 2])
+        _check({'a': (1, 2)}, {'a': [1, 2]})
+
+    def test_hash_mixed_keys(self):
+        result = types.Result(data={1: 'a', 'b': 2}).freeze()
+
+        self.assertEqual(
+            hash(result),
+            hash(types.Result(data={'b': 2, 1: 'a'}).freeze())
+        )
+        self.assertIsNotNone(result.content_hash)
+
+    def test_content_hash(self):
+        result = types.Result(data={'a': 1, 'b': [1, 2]})
+
+        self.assertEqual(
+            result.content_hash,
+            types.Result(data={'b': [1, 2], 'a': 1}).content_hash
+        )
+        self.assertNotEqual(
+            result.content_hash,
+            types.Result(error={'a': 1, 'b': [1, 2]}).content_hash
+        )
+
+    def test_equality(self):
+        result = types.Result(data=[1, 2], error=None)
+
+        self.assertEqual(result, result)
+        self.assertEqual(types.Result(data=[1, 2]), result)
+        self.assertNotEqual(types.Result(data=[1, 2], cancel=True), result)
+        self.assertNotEqual(types.Result(data=[1, 3]), result)
+        self.assertNotEqual(result, 'Result')
+
+    def test_copy(self):
+        result = types.Result(data={'a': 1}, error='Error').freeze()
+
+        result_copy = copy.deepcopy(result)
+
+        self.assertEqual(result, result_copy)
+        self.assertTrue(result_copy.frozen)
+
+    def test_serialization_frozen(self):
+        serializer = types.ResultSerializer()
+
+        result = types.Result(data={'a': 1}).freeze()
+
+        self.assertEqual(
+            result,
+            serializer.deserialize(serializer.serialize(result))
+        )
+
+
+class TestResultBatch(tests_base.TestCase):
+    def setUp(self):
+        super(TestResultBatch, self).setUp()
+
+        self.results = [
+            types.Result(data=1),
+            types.Result(error='Error 1'),
+            types.Result(data=3),
+            types.Result(error='Cancelled', cancel=True),
+            types.Result(error='Error 2')
+        ]
+
+        self.batch = types.ResultBatch(self.results)
+
+    def test_access(self):
+        self.assertEqual(5, len(self.batch))
+        self.assertEqual(self.results, list(self.batch))
+        self.assertEqual(self.results[-1], self.batch[-1])
+
+        self.assertRaises(IndexError, self.batch.__getitem__, 5)
+
+    def test_queries(self):
+        batch = self.batch
+
+        self.assertEqual(2, batch.count(batch.SUCCESS))
+        self.assertEqual(2, batch.count(batch.ERROR))
+        self.assertEqual(1, batch.count(batch.CANCEL))
+
+        self.assertEqual(1, batch.find(batch.ERROR))
+        self.assertEqual(-1, types.ResultBatch().find(batch.ERROR))
+
+        self.assertEqual([1, 4], batch.get_indexes(batch.ERROR))
+        self.assertEqual(
+            [self.results[1], self.results[4]],
+            batch.get_results(batch.ERROR)
+        )
+
+        self.assertTrue(batch.has_errors())
+        self.assertFalse(batch.is_success())
+
+        for idx, result in enumerate(self.results):
+            status = batch.get_status(idx)
+
+            self.assertEqual(result.is_error(), status == batch.ERROR)
+            self.assertEqual(result.is_cancel(), status == batch.CANCEL)
+            self.assertEqual(result.is_success(), status == batch.SUCCESS)
+
+    def test_serialization(self):
+        serializer = serialization.get_polymorphic_serializer()
+
+        data_str = serializer.serialize(self.batch)
+
+        self.assertEqual(self.batch, serializer.deserialize(data_str))
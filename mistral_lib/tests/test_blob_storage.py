@@ -0,0 +1,47 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import fixtures
+
+from mistral_lib import blob_storage
+from mistral_lib.tests import base
+
+
+class FileBlobStorageTest(base.TestCase):
+    def setUp(self):
+        super(FileBlobStorageTest, self).setUp()
+
+        self.directory = self.useFixture(fixtures.TempDir()).path
+        self.storage = blob_storage.FileBlobStorage(self.directory)
+
+    def test_put_get_delete(self):
+        key = self.storage.put(b'payload')
+
+        self.assertEqual(b'payload', bytes(self.storage.get(key)))
+        self.assertEqual([key], os.listdir(self.directory))
+
+        self.storage.delete(key)
+
+        self.assertRaises(KeyError, self.storage.get, key)
+
+        # Deleting a missing payload is not an error.
+        self.storage.delete(key)
+
+    def test_empty_payload(self):
+        key = self.storage.put(b'')
+
+        self.assertEqual(b'', bytes(self.storage.get(key)))
+
+    def test_invalid_key(self):
+        self.assertRaises(KeyError, self.storage.get, '../etc/passwd')
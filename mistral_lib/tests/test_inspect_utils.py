@@ -13,6 +13,7 @@
 #    limitations under the License.
 
 import time
+import typing
 
 from mistral_lib import actions
 from mistral_lib.tests import base
@@ -44,6 +45,17 @@ class DummyRunTask(object):
         pass
 
 
+class TypedAction(actions.Action):
+    def __init__(self, url: str, timeout: float = 10, retries: int = None,
+                 headers: dict[str, str] | None = None,
+                 body: typing.Any = None, tags: list[str] = (),
+                 untyped=None, **kwargs: int):
+        super(TypedAction, self).__init__()
+
+    def run(self, context):
+        return context
+
+
 class ClassWithProperties(object):
 
     a = 1
@@ -91,3 +103,18 @@ class InspectUtilsTest(base.TestCase):
         attrs = i_u.get_public_fields(ClassWithProperties)
 
         self.assertEqual(attrs, {'a': 1})
+
+    def test_get_arg_types(self):
+        self.assertEqual(
+            {
+                'url': (str,),
+                'timeout': (float, int),
+                'retries': (int, type(None)),
+                'headers': (dict, type(None)),
+                'tags': (list,)
+            },
+            i_u.get_arg_types(TypedAction.__init__)
+        )
+
+    def test_get_arg_types_no_annotations(self):
+        self.assertEqual({}, i_u.get_arg_types(DummyRunTask.__init__))
@@ -12,6 +12,15 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import bz2
+import copy
+import datetime
+import gc
+import threading
+from unittest import mock
+
+from oslo_serialization import jsonutils
+
 from mistral_lib import serialization
 from mistral_lib.tests import base
 
@@ -99,6 +108,156 @@ class SerializationTest(base.TestCase):
         self.assertIsNone(serializer.serialize(None))
         self.assertIsNone(serializer.deserialize(None))
 
+    def test_dumps(self):
+        data = {
+            'str': 'abc',
+            'list': [1, 2.5, None, True],
+            'tuple': (1, 2),
+            'set': {3},
+            'date': datetime.datetime(2020, 1, 1, 12, 30),
+            'obj': MyClass('a', {'b': datetime.date(2020, 1, 1)}),
+            'keys': {1: 'int', None: 'none'},
+            datetime.date(2020, 1, 2): 'date_key'
+        }
+
+        self.assertEqual(
+            jsonutils.dumps(
+                jsonutils.to_primitive(data, convert_instances=True)
+            ),
+            serialization.dumps(data)
+        )
+
+    def test_dict_based_serializer_non_primitive_data(self):
+        obj = MyClass(datetime.datetime(2020, 1, 1), ('x', 'y'))
+
+        serializer = MyClassSerializer()
+
+        self.assertEqual(
+            MyClass('2020-01-01T00:00:00.000000', ['x', 'y']),
+            serializer.deserialize(serializer.serialize(obj))
+        )
+
+    def test_dispatch_cache_invalidation(self):
+        serializer = serialization.PolymorphicSerializer()
+
+        obj = MyClass('a', 'b')
+
+        self.assertRaises(RuntimeError, serializer.serialize, obj)
+
+        serializer.register(MyClass, MyClassSerializer())
+
+        self.assertEqual(
+            obj,
+            serializer.deserialize(serializer.serialize(obj))
+        )
+
+        serializer.unregister(MyClass)
+
+        self.assertRaises(RuntimeError, serializer.serialize, obj)
+
+        serializer.register(MyClass, MyClassSerializer())
+        serializer.serialize(obj)
+        serializer.cleanup()
+
+        self.assertRaises(RuntimeError, serializer.serialize, obj)
+
+    def test_dispatch_cache_dynamic_class(self):
+        serializer = serialization.PolymorphicSerializer()
+
+        serializer.register(MyClass, MyClassSerializer())
+
+        dynamic_cls = type('MyDynamicClass', (MyClass,), {})
+        dynamic_cls.get_serialization_key = classmethod(
+            lambda cls: MyClass.get_serialization_key()
+        )
+
+        self.assertIn(
+            '__serial_key',
+            serializer.serialize(dynamic_cls('a', 'b'))
+        )
+        self.assertEqual(1, len(serializer._dispatch_cache))
+
+        del dynamic_cls
+        gc.collect()
+
+        self.assertEqual(0, len(serializer._dispatch_cache))
+
+    def test_freeze(self):
+        serializer = serialization.PolymorphicSerializer()
+
+        serializer.register(MyClass, MyClassSerializer())
+
+        self.assertFalse(serializer.frozen)
+
+        serializer.freeze()
+
+        self.assertTrue(serializer.frozen)
+
+        obj = MyClass('a', 'b')
+
+        self.assertEqual(
+            obj,
+            serializer.deserialize(serializer.serialize(obj))
+        )
+
+        self.assertRaises(RuntimeError, serializer.unregister, MyClass)
+        self.assertRaises(
+            RuntimeError,
+            serializer.register,
+            MyClass,
+            MyClassSerializer()
+        )
+        self.assertRaises(RuntimeError, serializer.cleanup)
+
+    def test_concurrent_registration(self):
+        serializer = serialization.PolymorphicSerializer()
+
+        serializer.register(MyClass, MyClassSerializer())
+
+        classes = [
+            type('MyClass%s' % i, (MyClass,), {}) for i in range(50)
+        ]
+
+        errors = []
+        stop = threading.Event()
+
+        def _serialize():
+            obj = MyClass('a', 'b')
+
+            try:
+                while not stop.is_set():
+                    s = serializer.serialize(obj)
+
+                    self.assertEqual(obj, serializer.deserialize(s))
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=_serialize) for _ in range(4)]
+
+        for t in readers:
+            t.start()
+
+        for cls in classes:
+            serializer.register(cls, MyClassSerializer())
+
+        stop.set()
+
+        for t in readers:
+            t.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(51, len(serializer.serializers))
+
+    def test_polymorphic_serializer_bytes(self):
+        serializer = serialization.get_polymorphic_serializer()
+
+        obj = MyClass('a', 'b')
+
+        data = serializer.serialize(obj).encode('utf-8')
+
+        self.assertEqual(obj, serializer.deserialize(data))
+        self.assertEqual(obj, serializer.deserialize(memoryview(data)))
+
     def test_register_twice(self):
         self.assertRaises(
             RuntimeError,
@@ -106,3 +265,237 @@ class SerializationTest(base.TestCase):
             MyClass,
             MyClassSerializer()
         )
+
+
+class CountingContentResolver(serialization.InMemoryContentResolver):
+    def __init__(self):
+        super(CountingContentResolver, self).__init__()
+
+        self.put_count = 0
+        self.get_count = 0
+
+    def put(self, digest, value):
+        self.put_count += 1
+
+        super(CountingContentResolver, self).put(digest, value)
+
+    def get(self, digest):
+        self.get_count += 1
+
+        return super(CountingContentResolver, self).get(digest)
+
+
+class ContentCacheTest(base.TestCase):
+    def test_digest(self):
+        digest_1, size = serialization.get_content_digest({'a': 1, 'b': 2})
+        digest_2, _ = serialization.get_content_digest({'b': 2, 'a': 1})
+
+        self.assertEqual(digest_1, digest_2)
+        self.assertEqual(len('{"a": 1, "b": 2}'), size)
+
+        # Keys of different types are converted into strings as in JSON.
+        digest_1, size = serialization.get_content_digest({1: 'a', 'b': 2})
+        digest_2, _ = serialization.get_content_digest({'b': 2, '1': 'a'})
+
+        self.assertEqual(digest_1, digest_2)
+        self.assertEqual(len('{"1": "a", "b": 2}'), size)
+
+    def test_put_and_get(self):
+        resolver = CountingContentResolver()
+
+        sender = serialization.ContentCache(resolver)
+        receiver = serialization.ContentCache(resolver)
+
+        value = ['a', 'b']
+
+        digest, _ = sender.get_digest(value)
+
+        sender.put(digest, value)
+        sender.put(digest, value)
+
+        self.assertEqual(1, resolver.put_count)
+
+        self.assertEqual(value, receiver.get(digest))
+        self.assertEqual(value, receiver.get(digest))
+
+        self.assertEqual(1, resolver.get_count)
+
+    def test_digest_of_modified_value(self):
+        resolver = CountingContentResolver()
+
+        sender = serialization.ContentCache(resolver)
+        receiver = serialization.ContentCache(resolver)
+
+        value = {'url': 'http://a'}
+
+        digest_1, _ = sender.get_digest(value)
+        sender.put(digest_1, value)
+
+        # E.g. the catalog got refreshed in place.
+        value['url'] = 'http://b'
+
+        digest_2, _ = sender.get_digest(value)
+        sender.put(digest_2, copy.deepcopy(value))
+
+        self.assertNotEqual(digest_1, digest_2)
+        self.assertEqual({'url': 'http://b'}, receiver.get(digest_2))
+
+    def test_values_not_shared(self):
+        resolver = serialization.InMemoryContentResolver()
+
+        sender = serialization.ContentCache(resolver)
+        receiver = serialization.ContentCache(resolver)
+
+        value = [{'url': 'http://a'}]
+
+        digest, _ = sender.get_digest(value)
+        sender.put(digest, value)
+
+        value_1 = receiver.get(digest)
+        value_1.append({'url': 'http://b'})
+        value_2 = receiver.get(digest)
+        value_2[0]['url'] = 'http://c'
+
+        self.assertEqual([{'url': 'http://a'}], value)
+        self.assertEqual([{'url': 'http://a'}], receiver.get(digest))
+        self.assertEqual([{'url': 'http://a'}], resolver.get(digest))
+
+    def test_republish(self):
+        resolver = CountingContentResolver()
+
+        cache = serialization.ContentCache(resolver, republish_interval=10)
+
+        with mock.patch('time.monotonic', return_value=100):
+            cache.put('1', 1)
+            cache.put('1', 1)
+
+        self.assertEqual(1, resolver.put_count)
+
+        with mock.patch('time.monotonic', return_value=111):
+            cache.put('1', 1)
+
+        self.assertEqual(2, resolver.put_count)
+
+    def test_bounded(self):
+        resolver = CountingContentResolver()
+
+        cache = serialization.ContentCache(resolver, max_size=2)
+
+        for i in range(3):
+            cache.put(str(i), i)
+
+        self.assertEqual(2, cache.get('2'))
+        self.assertEqual(0, resolver.get_count)
+
+        self.assertEqual(0, cache.get('0'))
+        self.assertEqual(1, resolver.get_count)
+
+        self.assertRaises(KeyError, cache.get, 'unknown')
+
+
+class CompressionTest(base.TestCase):
+    def setUp(self):
+        super(CompressionTest, self).setUp()
+
+        self.big_obj = MyClass(
+            [{'name': 'item', 'value': i} for i in range(200)],
+            'b'
+        )
+
+    def test_dict_based_serializer(self):
+        serializer = MyClassSerializer()
+        serializer.compression = serialization.Compression(threshold=100)
+
+        s = serializer.serialize(self.big_obj)
+
+        self.assertIn('"__serial_codec": "zlib"', s)
+        self.assertLess(
+            len(s),
+            len(MyClassSerializer().serialize(self.big_obj))
+        )
+
+        self.assertEqual(self.big_obj, serializer.deserialize(s))
+
+        # The receiving side doesn't need compression settings.
+        self.assertEqual(self.big_obj, MyClassSerializer().deserialize(s))
+
+        # Small payloads are not compressed.
+        obj = MyClass('a', 'b')
+
+        self.assertEqual(
+            MyClassSerializer().serialize(obj),
+            serializer.serialize(obj)
+        )
+
+    def test_polymorphic_serializer(self):
+        serializer = serialization.PolymorphicSerializer(
+            compression=serialization.Compression('lzma', threshold=100)
+        )
+        serializer.register(MyClass, MyClassSerializer())
+
+        s = serializer.serialize(self.big_obj)
+
+        self.assertIn('"__serial_codec": "lzma"', s)
+        self.assertEqual(self.big_obj, serializer.deserialize(s))
+
+        primitive = ['abc'] * 100
+
+        s = serializer.serialize(primitive)
+
+        self.assertIn('"__serial_codec": "lzma"', s)
+        self.assertEqual(primitive, serializer.deserialize(s))
+
+        self.assertEqual('"abc"', serializer.serialize('abc'))
+
+    def test_custom_codec(self):
+        serialization.register_codec('bz2', bz2.compress, bz2.decompress)
+
+        self.addCleanup(serialization._CODECS.pop, 'bz2')
+
+        serializer = MyClassSerializer()
+        serializer.compression = serialization.Compression(
+            'bz2',
+            threshold=0
+        )
+
+        s = serializer.serialize(self.big_obj)
+
+        self.assertIn('"__serial_codec": "bz2"', s)
+        self.assertEqual(self.big_obj, serializer.deserialize(s))
+
+    def test_not_compressed_if_not_smaller(self):
+        serializer = MyClassSerializer()
+        serializer.compression = serialization.Compression(threshold=0)
+
+        obj = MyClass('a', 'b')
+
+        self.assertEqual(
+            MyClassSerializer().serialize(obj),
+            serializer.serialize(obj)
+        )
+
+    def test_envelope_like_values(self):
+        value = {'__serial_codec': 'zlib', '__serial_data': 'abc'}
+
+        for serializer in (
+                serialization.PolymorphicSerializer(),
+                serialization.PolymorphicSerializer(
+                    compression=serialization.Compression(threshold=0)
+                )):
+            self.assertEqual(
+                value,
+                serializer.deserialize(serializer.serialize(value))
+            )
+
+        # Dictionaries with other keys are not envelopes.
+        value = dict(value, other=1)
+
+        serializer = serialization.PolymorphicSerializer()
+
+        self.assertEqual(
+            value,
+            serializer.deserialize(serializer.serialize(value))
+        )
+
+    def test_unknown_codec(self):
+        self.assertRaises(ValueError, serialization.Compression, 'unknown')
@@ -15,10 +15,25 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import abc
+import asyncio
 import copy
-
+import datetime
+import enum
+import gc
+import mmap
+import string
+import tempfile
+import threading
+from unittest import mock
+import uuid
+import weakref
+
+from oslo_utils import uuidutils
 from yaql.language import utils as yaql_utils
 
+from mistral_lib import actions
+from mistral_lib import serialization
 from mistral_lib.tests import base as tests_base
 from mistral_lib import utils
 
@@ -87,6 +102,390 @@ class TestUtils(tests_base.TestCase):
 
         self.assertDictEqual(left, expected)
 
+    def test_merge_dicts_deep(self):
+        left = {}
+        right = {}
+
+        left_d = left
+        right_d = right
+
+        for _ in range(5000):
+            left_d['n'] = {}
+            right_d['n'] = {}
+
+            left_d = left_d['n']
+            right_d = right_d['n']
+
+        right_d['value'] = 1
+
+        utils.merge_dicts(left, right)
+
+        for _ in range(5000):
+            left = left['n']
+
+        self.assertEqual({'value': 1}, left)
+
+    def test_merge_dicts_with_policy(self):
+        left = copy.deepcopy(LEFT)
+        right = copy.deepcopy(RIGHT)
+
+        changes = utils.merge_dicts_with_policy(left, right)
+
+        self.assertDictEqual(
+            {
+                'key1': {
+                    'key11': "val111111",
+                    'key12': "val12",
+                    'key13': {
+                        'key131': 'val131'
+                    }
+                },
+                'key2': 'val2222',
+                'key3': 'val3'
+            },
+            left
+        )
+
+        self.assertEqual(
+            sorted([
+                ('key1', 'key11'),
+                ('key1', 'key12'),
+                ('key1', 'key13'),
+                ('key2',),
+                ('key3',)
+            ]),
+            sorted(changes)
+        )
+
+    def test_merge_dicts_with_policy_keep(self):
+        left = copy.deepcopy(LEFT)
+
+        changes = utils.merge_dicts_with_policy(
+            left,
+            copy.deepcopy(RIGHT),
+            policy=utils.MERGE_KEEP
+        )
+
+        self.assertEqual('val11', left['key1']['key11'])
+        self.assertEqual('val2', left['key2'])
+        self.assertEqual(
+            sorted([('key1', 'key12'), ('key1', 'key13'), ('key3',)]),
+            sorted(changes)
+        )
+
+    def test_merge_dicts_with_path_policies(self):
+        left = {
+            'items': [1, 2],
+            'tags': ['a'],
+            'counters': {'total': 1, 'failed': 1},
+            'name': 'left'
+        }
+        right = {
+            'items': [3],
+            'tags': ['b'],
+            'counters': {'total': 2, 'failed': 2},
+            'name': 'right'
+        }
+
+        changes = utils.merge_dicts_with_policy(
+            left,
+            right,
+            policy=utils.MERGE_KEEP,
+            path_policies={
+                ('items',): utils.MERGE_APPEND,
+                ('counters', 'total'): lambda path, lv, rv: lv + rv,
+            }
+        )
+
+        self.assertEqual(
+            {
+                'items': [1, 2, 3],
+                'tags': ['a'],
+                'counters': {'total': 3, 'failed': 1},
+                'name': 'left'
+            },
+            left
+        )
+        self.assertEqual(
+            sorted([('items',), ('counters', 'total')]),
+            sorted(changes)
+        )
+
+    def test_merge_dicts_with_policy_equal_values(self):
+        data = '{"n": 1, "a": {"name": "x", "ip": "1.1.1.1", "l": [1]}}'
+
+        for policy in (utils.MERGE_OVERWRITE, utils.MERGE_APPEND):
+            left = utils.from_json_str(data)
+
+            changes = utils.merge_dicts_with_policy(
+                left,
+                utils.from_json_str(data),
+                policy=policy
+            )
+
+            # Only the appended list is changed.
+            expected = [('a', 'l')] if policy == utils.MERGE_APPEND else []
+
+            self.assertEqual(expected, changes)
+
+        # Values of different types are different even if equal.
+        left = {'a': 1}
+
+        changes = utils.merge_dicts_with_policy(left, {'a': True})
+
+        self.assertEqual([('a',)], changes)
+        self.assertIs(True, left['a'])
+
+    def test_merge_dicts_with_unknown_policy(self):
+        self.assertRaises(
+            ValueError,
+            utils.merge_dicts_with_policy,
+            {'a': 1},
+            {'a': 2},
+            'unknown'
+        )
+
+    def test_dict_diff(self):
+        old = copy.deepcopy(LEFT)
+        old['key4'] = {'key41': 'val41'}
+
+        new = copy.deepcopy(RIGHT)
+        new['key1'].pop('key11')
+
+        patch = utils.dict_diff(old, new)
+
+        self.assertEqual(
+            utils.DictPatch(
+                updates={
+                    'key1': {
+                        'key12': "val12",
+                        'key13': {
+                            'key131': 'val131'
+                        }
+                    },
+                    'key2': 'val2222',
+                    'key3': 'val3'
+                },
+                deletes=[['key1', 'key11'], ['key4']]
+            ),
+            patch
+        )
+
+        self.assertEqual(new, utils.apply_patch(old, patch))
+
+    def test_dict_diff_no_changes(self):
+        patch = utils.dict_diff(
+            {'a': {'b': {'c': 1}}, 'd': [1]},
+            {'a': {'b': {'c': 1}}, 'd': [1]}
+        )
+
+        self.assertFalse(patch)
+        self.assertEqual({}, patch.updates)
+
+    def test_apply_patch_copies_values(self):
+        patch = utils.dict_diff({}, {'a': {'b': [1]}})
+
+        res = utils.apply_patch({}, patch)
+
+        res['a']['b'].append(2)
+
+        self.assertEqual({'a': {'b': [1]}}, patch.updates)
+
+    def test_dict_patch_serialization(self):
+        serializer = serialization.get_polymorphic_serializer()
+
+        patch = utils.dict_diff({'a': 1, 'b': {'c': 2}}, {'b': {'c': 3}})
+
+        self.assertEqual(
+            patch,
+            serializer.deserialize(serializer.serialize(patch))
+        )
+
+    def test_generate_uuids(self):
+        uuids = utils.generate_uuids(5000)
+
+        self.assertEqual(5000, len(uuids))
+        self.assertEqual(5000, len(set(uuids)))
+
+        for u in uuids:
+            uuid_obj = uuid.UUID(u)
+
+            self.assertEqual(u, str(uuid_obj))
+            self.assertEqual(4, uuid_obj.version)
+            self.assertEqual(uuid.RFC_4122, uuid_obj.variant)
+
+        self.assertEqual([], utils.generate_uuids(0))
+
+    def test_validate_uuids(self):
+        u = utils.generate_unicode_uuid()
+
+        values = [
+            u,
+            u.upper(),
+            u.replace('-', ''),
+            '{%s}' % u,
+            'urn:uuid:%s' % u,
+            'URN:UUID:%s' % u,
+            u[:-1],
+            u + '0',
+            ' ' + u,
+            u.replace('-', '_'),
+            u.encode(),
+            None,
+            123
+        ]
+
+        self.assertEqual(
+            [uuidutils.is_uuid_like(v) for v in values],
+            utils.validate_uuids(values)
+        )
+        self.assertEqual(
+            [True, True, True, True, True, False, False, False, False,
+             False, False, False, False],
+            utils.validate_uuids(values)
+        )
+
+    def test_thread_local(self):
+        self.assertFalse(utils.has_thread_local('test_var'))
+        self.assertIsNone(utils.get_thread_local('test_var'))
+
+        utils.set_thread_local('test_var', 'val')
+
+        self.assertTrue(utils.has_thread_local('test_var'))
+        self.assertEqual('val', utils.get_thread_local('test_var'))
+
+        thread_values = []
+
+        def _read():
+            thread_values.append(utils.get_thread_local('test_var'))
+
+        t = threading.Thread(target=_read)
+        t.start()
+        t.join()
+
+        self.assertEqual([None], thread_values)
+
+        utils.set_thread_local('test_var', None)
+
+        self.assertFalse(utils.has_thread_local('test_var'))
+
+    def test_thread_local_asyncio_tasks(self):
+        async def _task(val):
+            utils.set_thread_local('test_var', val)
+
+            await asyncio.sleep(0)
+
+            return utils.get_thread_local('test_var')
+
+        async def _main():
+            return await asyncio.gather(_task(1), _task(2))
+
+        self.assertEqual([1, 2], asyncio.run(_main()))
+        self.assertIsNone(utils.get_thread_local('test_var'))
+
+    def test_thread_local_scope(self):
+        utils.set_thread_local('test_var', 'val')
+
+        self.addCleanup(utils.set_thread_local, 'test_var', None)
+
+        with utils.thread_local_scope('test_var', 'scoped'):
+            self.assertEqual('scoped', utils.get_thread_local('test_var'))
+
+            with utils.thread_local_scope('test_var', None):
+                self.assertFalse(utils.has_thread_local('test_var'))
+
+            self.assertEqual('scoped', utils.get_thread_local('test_var'))
+
+        self.assertEqual('val', utils.get_thread_local('test_var'))
+
+    def test_utc_now_sec(self):
+        with mock.patch('time.time', return_value=1600000000.75):
+            now = utils.utc_now_sec()
+
+            self.assertEqual(datetime.datetime(2020, 9, 13, 12, 26, 40), now)
+            self.assertIs(now, utils.utc_now_sec())
+
+        with mock.patch('time.time', return_value=1600000001.1):
+            self.assertEqual(
+                datetime.datetime(2020, 9, 13, 12, 26, 41),
+                utils.utc_now_sec()
+            )
+
+    def test_utc_now_sec_mocked_utcnow(self):
+        date = datetime.datetime(2020, 1, 1, 10, 20, 30, 400)
+
+        with mock.patch(
+                'oslo_utils.timeutils.utcnow', return_value=date):
+            self.assertEqual(
+                datetime.datetime(2020, 1, 1, 10, 20, 30),
+                utils.utc_now_sec()
+            )
+
+    def test_get_process_identifier(self):
+        self.addCleanup(utils._reset_process_identifier)
+
+        with mock.patch('os.getpid', return_value=123):
+            utils._reset_process_identifier()
+
+            proc_id = utils.get_process_identifier()
+
+            self.assertTrue(proc_id.endswith('_123'))
+
+        # Cached until the process forks.
+        self.assertIs(proc_id, utils.get_process_identifier())
+
+    def test_datetime_to_str_in_dicts(self):
+        date = datetime.datetime(2020, 1, 1, 10, 20, 30)
+
+        dicts = [
+            {'created_at': date, 'updated_at': None},
+            {'created_at': date, 'updated_at': date, 'name': 'a'},
+            {'name': 'b'}
+        ]
+
+        utils.datetime_to_str_in_dicts(dicts, ['created_at', 'updated_at'])
+
+        self.assertEqual(
+            [
+                {
+                    'created_at': '2020-01-01 10:20:30',
+                    'updated_at': None
+                },
+                {
+                    'created_at': '2020-01-01 10:20:30',
+                    'updated_at': '2020-01-01 10:20:30',
+                    'name': 'a'
+                },
+                {'name': 'b'}
+            ],
+            dicts
+        )
+
+    def test_generate_string(self):
+        alphabet = set(string.ascii_uppercase + string.digits)
+
+        for secure in (False, True):
+            for length in (0, 1, 10, 1000):
+                s = utils.generate_string(length, secure=secure)
+
+                self.assertEqual(length, len(s))
+                self.assertTrue(set(s) <= alphabet)
+
+    def test_generate_strings(self):
+        for secure in (False, True):
+            strings = utils.generate_strings(100, 8, secure=secure)
+
+            self.assertEqual(100, len(strings))
+            self.assertTrue(all(len(s) == 8 for s in strings))
+            self.assertGreater(len(set(strings)), 1)
+
+        self.assertEqual([], utils.generate_strings(0, 8))
+        self.assertEqual(['', ''], utils.generate_strings(2, 0))
+        self.assertEqual(
+            [''] * 3,
+            utils.generate_strings(3, 0, secure=True)
+        )
+
     def test_itersubclasses(self):
         class A(object):
             pass
@@ -102,6 +501,133 @@ class TestUtils(tests_base.TestCase):
 
         self.assertEqual([B, C, D], list(utils.iter_subclasses(A)))
 
+    def test_get_subclasses(self):
+        # Removing classes left by other tests invalidates the cache.
+        gc.collect()
+        gc.disable()
+
+        self.addCleanup(gc.enable)
+
+        class A(actions.Action):
+            pass
+
+        class AbstractB(A):
+            pass
+
+        class B(AbstractB):
+            def run(self, context):
+                pass
+
+        class C(A):
+            def run(self, context):
+                pass
+
+        dynamic_cls = utils.create_dynamic_class(C, {'attr': 1})
+
+        self.assertEqual((B, C), utils.get_subclasses(A))
+        self.assertEqual((AbstractB, B, C), utils.get_subclasses(A, False))
+        self.assertEqual(
+            (B, C, dynamic_cls),
+            utils.get_subclasses(A, include_dynamic=True)
+        )
+
+        # The result is cached.
+        with mock.patch.object(utils, '_is_abstract') as is_abstract:
+            self.assertEqual((B, C), utils.get_subclasses(A))
+
+        is_abstract.assert_not_called()
+
+        class D(C):
+            pass
+
+        self.assertEqual((B, C, D), utils.get_subclasses(A))
+
+    def test_get_subclasses_not_action(self):
+        class Base(object):
+            pass
+
+        class A(Base):
+            pass
+
+        self.assertEqual((A,), utils.get_subclasses(Base))
+
+        class B(Base):
+            pass
+
+        class C(A):
+            pass
+
+        self.assertEqual((A, C, B), utils.get_subclasses(Base))
+
+    def test_get_subclasses_removed_class(self):
+        class A(actions.Action):
+            pass
+
+        class B(A):
+            def run(self, context):
+                pass
+
+        self.assertEqual((B,), utils.get_subclasses(A))
+
+        b_ref = weakref.ref(B)
+
+        del B
+        gc.collect()
+
+        # The cache doesn't keep removed classes alive.
+        self.assertIsNone(b_ref())
+        self.assertEqual((), utils.get_subclasses(A))
+
+    def test_get_subclasses_dynamic_classes_keep_cache(self):
+        class A(actions.Action):
+            def run(self, context):
+                pass
+
+        gc.collect()
+        gc.disable()
+
+        self.addCleanup(gc.enable)
+
+        self.assertEqual((), utils.get_subclasses(A))
+
+        subclasses = utils.get_subclasses(actions.Action)
+
+        self.assertIn(A, subclasses)
+
+        dynamic_cls = utils.create_dynamic_class(A, {'attr': 1})
+
+        with mock.patch.object(utils, '_is_abstract') as is_abstract:
+            self.assertEqual((), utils.get_subclasses(A))
+            self.assertEqual(
+                subclasses,
+                utils.get_subclasses(actions.Action)
+            )
+
+        is_abstract.assert_not_called()
+
+        self.assertEqual(
+            (dynamic_cls,),
+            utils.get_subclasses(A, include_dynamic=True)
+        )
+
+    def test_get_subclasses_invalidate(self):
+        class A(actions.Action):
+            pass
+
+        class B(A):
+            def run(self, context):
+                pass
+
+        self.assertEqual((B,), utils.get_subclasses(A))
+
+        B.run = abc.abstractmethod(lambda self, context: None)
+
+        self.assertEqual((B,), utils.get_subclasses(A))
+
+        utils.invalidate_subclass_cache()
+
+        self.assertEqual((), utils.get_subclasses(A))
+
     def test_get_dict_from_entries(self):
         input = ['param1', {'param2': 2}]
         input_dict = utils.get_dict_from_entries(input)
@@ -255,6 +781,46 @@ class TestUtils(tests_base.TestCase):
         s = utils.cut(d, 65500)
         self.assertThat(len(s), ttm.Not(ttm.GreaterThan(65500)))
 
+    def test_cut_by_bytes(self):
+        s = utils.cut_by_bytes('\u0442\u0435\u0441\u0442' * 10, 15)
+
+        self.assertEqual('\u0442\u0435\u0441\u0442\u0442\u0435...', s)
+        self.assertEqual(15, len(s.encode('utf-8')))
+
+        s = utils.cut_by_bytes('\u0442\u0435\u0441\u0442' * 10, 16)
+
+        # A multi-byte character is never split.
+        self.assertEqual('\u0442\u0435\u0441\u0442\u0442\u0435...', s)
+
+        self.assertEqual('Hello...', utils.cut_by_bytes('Hello, Mistral!', 8))
+        self.assertEqual('Hello', utils.cut_by_bytes('Hello', 8))
+
+        # No room for the ellipsis.
+        self.assertEqual('ab', utils.cut_by_bytes('abc', 2))
+        self.assertEqual('', utils.cut_by_bytes('abc', 0))
+        self.assertEqual(
+            '\u0442',
+            utils.cut_by_bytes('\u0442\u0435\u0441\u0442', 3)
+        )
+
+    def test_cut_by_kb_in_bytes(self):
+        d = [{'value': '\u00e9' * 100} for _ in range(100)]
+
+        s = utils.cut_by_kb(d, 1, in_bytes=True)
+
+        # The last two-byte character doesn't fit.
+        self.assertEqual(1023, len(s.encode('utf-8')))
+        self.assertTrue(s.endswith('...'))
+
+        d = {i: '\u0442\u0435\u0441\u0442' for i in range(1000)}
+
+        s = utils.cut_by_kb(d, 2, in_bytes=True)
+
+        self.assertThat(
+            len(s.encode('utf-8')),
+            ttm.Not(ttm.GreaterThan(2048))
+        )
+
     def test_mask_data(self):
         payload = {'adminPass': 'fooBarBaz'}
         expected = {'adminPass': '***'}
@@ -338,3 +904,243 @@ class TestUtils(tests_base.TestCase):
         self.assertIn('"a": 11', json_str)
         self.assertIn('"b": {"b": "222"}', json_str)
         self.assertIn('"c": [1, {"a": [4, {"a": 99}]}]', json_str)
+
+    def test_json_deserialize_bytes_like(self):
+        json_str = '{"a": [1, 2], "b": "\u0442\u0435\u0441\u0442"}'
+        expected = {'a': [1, 2], 'b': '\u0442\u0435\u0441\u0442'}
+
+        data = json_str.encode('utf-8')
+
+        self.assertEqual(expected, utils.from_json_str(json_str))
+        self.assertEqual(expected, utils.from_json_str(data))
+        self.assertEqual(expected, utils.from_json_str(bytearray(data)))
+        self.assertEqual(expected, utils.from_json_str(memoryview(data)))
+
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                self.assertEqual(expected, utils.from_json_str(mm))
+
+    def test_estimate_serialized_size(self):
+        class MyObj(object):
+            def __init__(self):
+                self.a = [1, '\u0442\u0435\u0441\u0442', None]
+                self.b = datetime.datetime(2020, 1, 1)
+
+        values = [
+            1,
+            -2.5,
+            float('nan'),
+            True,
+            'abc "quoted"\n',
+            [],
+            {},
+            (1, (2, 3)),
+            {'a': [1, {'b': None}], 1: False, None: 1.5, 2.5: 'x'},
+            yaql_utils.FrozenDict(a=1, b=(1, 2)),
+            MyObj(),
+            range(3)
+        ]
+
+        for val in values:
+            self.assertEqual(
+                len(utils.to_json_str(val)),
+                utils.estimate_serialized_size(val),
+                "Wrong size of %r" % (val,)
+            )
+
+        self.assertEqual(0, utils.estimate_serialized_size(None))
+
+    def test_estimate_serialized_size_scalar_subclasses(self):
+        class MyStr(str):
+            pass
+
+        class MyInt(enum.IntEnum):
+            ONE = 1
+
+        class MyFloat(float):
+            pass
+
+        values = [
+            MyStr('abc'),
+            MyInt.ONE,
+            MyFloat(1.5),
+            [MyStr('a'), MyInt.ONE, MyFloat(-0.25)],
+            {MyStr('a'): MyFloat(2.0), MyInt.ONE: 'x', MyFloat(0.5): None}
+        ]
+
+        for val in values:
+            self.assertEqual(
+                len(utils.to_json_str(val)),
+                utils.estimate_serialized_size(val),
+                "Wrong size of %r" % (val,)
+            )
+
+    def test_estimate_serialized_size_not_convertible(self):
+        with mock.patch.object(
+            utils.jsonutils,
+            'to_primitive',
+            side_effect=lambda val, **kwargs: val
+        ):
+            self.assertRaises(
+                TypeError,
+                utils.estimate_serialized_size,
+                [object()]
+            )
+
+    def test_estimate_serialized_size_generator(self):
+        def _gen():
+            yield 1
+            yield yaql_utils.FrozenDict(a=1)
+
+        self.assertEqual(
+            len('[1, {"a": 1}]'),
+            utils.estimate_serialized_size(_gen())
+        )
+
+    def test_estimate_serialized_size_limit(self):
+        data = [{'value': 'x' * 100} for _ in range(1000)]
+
+        size = utils.estimate_serialized_size(data, limit=500)
+
+        self.assertGreater(size, 500)
+        self.assertLess(size, len(utils.to_json_str(data)))
+
+    def test_estimate_serialized_size_circular_reference(self):
+        data = {'a': []}
+        data['a'].append(data)
+
+        self.assertRaises(ValueError, utils.estimate_serialized_size, data)
+
+        # Shared but not circular references are fine.
+        shared = [1, 2]
+
+        self.assertEqual(
+            len('[[1, 2], [1, 2]]'),
+            utils.estimate_serialized_size([shared, shared])
+        )
+
+    def test_estimate_serialized_size_persistent_dicts(self):
+        # Dicts made of nested persistent dicts are temporary so their
+        # IDs may be reused and must not be taken for circular references.
+        for i in range(200):
+            val = utils.merge_dicts_persistent(
+                {'c': {'c': {'a': 1}}},
+                {'c': {'c': {'b': i}, 'd': {'e': {'f': i}}}}
+            )
+
+            self.assertEqual(
+                len(utils.to_json_str(val)),
+                utils.estimate_serialized_size(val)
+            )
+
+    def test_persistent_dict(self):
+        base = {'a': 1, 'b': {'c': 2}}
+
+        d1 = utils.PersistentDict(base)
+        d2 = d1.set('d', 3)
+        d3 = d2.delete('a')
+
+        self.assertEqual({'a': 1, 'b': {'c': 2}}, d1)
+        self.assertEqual({'a': 1, 'b': {'c': 2}, 'd': 3}, d2)
+        self.assertEqual({'b': {'c': 2}, 'd': 3}, d3)
+
+        self.assertEqual(2, len(d1))
+        self.assertEqual(3, len(d2))
+        self.assertEqual(2, len(d3))
+
+        self.assertNotIn('a', d3)
+        self.assertIn('a', d2)
+        self.assertIsNone(d3.get('a'))
+        self.assertRaises(KeyError, d3.delete, 'a')
+
+        self.assertIs(base['b'], d3['b'])
+        self.assertEqual({'a': 1, 'b': {'c': 2}}, base)
+
+    def test_persistent_dict_long_chain(self):
+        d = utils.PersistentDict()
+        expected = {}
+
+        for i in range(100):
+            d = d.set(i % 30, i)
+            expected[i % 30] = i
+
+            if i % 7 == 0:
+                d = d.delete(i % 30)
+                del expected[i % 30]
+
+        self.assertEqual(expected, d)
+        self.assertEqual(len(expected), len(d))
+        self.assertEqual(sorted(expected), sorted(d))
+
+    def test_merge_dicts_persistent(self):
+        left = copy.deepcopy(LEFT)
+        right = copy.deepcopy(RIGHT)
+
+        res = utils.merge_dicts_persistent(left, right)
+
+        self.assertIsInstance(res, utils.PersistentDict)
+        self.assertEqual(
+            {
+                'key1': {
+                    'key11': "val111111",
+                    'key12': "val12",
+                    'key13': {
+                        'key131': 'val131'
+                    }
+                },
+                'key2': 'val2222',
+                'key3': 'val3'
+            },
+            res.to_dict()
+        )
+
+        # The merged dictionaries are not modified.
+        self.assertEqual(LEFT, left)
+        self.assertEqual(RIGHT, right)
+
+        res = utils.merge_dicts_persistent(res, {'key1': {'key11': 'new'}})
+
+        self.assertEqual('new', res['key1']['key11'])
+        self.assertEqual('val12', res['key1']['key12'])
+
+    def test_merge_dicts_persistent_overwrite_false(self):
+        res = utils.merge_dicts_persistent(
+            copy.deepcopy(LEFT),
+            copy.deepcopy(RIGHT),
+            overwrite=False
+        )
+
+        self.assertEqual(
+            {
+                'key1': {
+                    'key11': "val11",
+                    'key12': "val12",
+                    'key13': {
+                        'key131': 'val131'
+                    }
+                },
+                'key2': 'val2',
+                'key3': 'val3'
+            },
+            res.to_dict()
+        )
+
+    def test_persistent_dict_serialization(self):
+        res = utils.PersistentDict({})
+
+        for i in range(5):
+            res = utils.merge_dicts_persistent(
+                res,
+                {'a': {'b': {'c': {'d': {'e%s' % i: i}}}}}
+            )
+
+        expected = res.to_dict()
+
+        self.assertEqual(expected, utils.from_json_str(utils.to_json_str(res)))
+        self.assertEqual(
+            len(utils.to_json_str(expected)),
+            utils.estimate_serialized_size(res)
+        )
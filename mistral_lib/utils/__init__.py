@@ -15,6 +15,10 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import collections.abc
+import contextlib
+import contextvars
+import copy
 import datetime
 import functools
 import importlib.resources
@@ -22,11 +26,13 @@ import inspect
 import json
 import os
 from os import path
+import re
 import socket
 import string
 import sys
 import threading
 import time
+import weakref
 
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -36,42 +42,150 @@ from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import random
 
+from mistral_lib import serialization
 
-# Thread local storage.
-_th_loc_storage = threading.local()
+
+# Thread local storage. It's implemented with context variables so that
+# the values are also local to asyncio tasks and greenthreads.
+_context_vars = {}
+_context_vars_lock = threading.Lock()
 
 
 def generate_unicode_uuid():
     return uuidutils.generate_uuid()
 
 
+# Number of UUIDs generated from one chunk of random bytes.
+_UUID_CHUNK_SIZE = 4096
+
+# Maps the first hex digit of the clock_seq_hi_variant byte to the digit
+# with the RFC 4122 variant bits set, as uuid.UUID(version=4) does.
+_UUID_VARIANT_DIGITS = {
+    '%x' % i: '%x' % (i & 0x3 | 0x8) for i in range(16)
+}
+
+_UUID_CANONICAL_PATTERN = re.compile(
+    r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+)
+_UUID_HEX_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+def generate_uuids(n):
+    """Generates a list of random UUID strings.
+
+    The result is the same as of calling generate_unicode_uuid() n times,
+    i.e. dashed version 4 UUIDs, but random bytes are read in big chunks
+    and no intermediate UUID objects are created.
+
+    :param n: Number of UUIDs.
+    :return: A list of strings.
+    """
+
+    variants = _UUID_VARIANT_DIGITS
+
+    res = []
+
+    for i in range(0, n, _UUID_CHUNK_SIZE):
+        hex_str = os.urandom(16 * min(_UUID_CHUNK_SIZE, n - i)).hex()
+
+        res.extend(
+            '%s-%s-4%s-%s%s-%s' % (
+                hex_str[j:j + 8],
+                hex_str[j + 8:j + 12],
+                hex_str[j + 13:j + 16],
+                variants[hex_str[j + 16]],
+                hex_str[j + 17:j + 20],
+                hex_str[j + 20:j + 32]
+            )
+            for j in range(0, len(hex_str), 32)
+        )
+
+    return res
+
+
+def _is_valid_uuid(val):
+    if not isinstance(val, str):
+        return False
+
+    if _UUID_CANONICAL_PATTERN.fullmatch(val):
+        return True
+
+    # The same normalization as in oslo_utils.uuidutils.is_uuid_like().
+    val = (
+        val.replace('urn:', '').replace('uuid:', '').strip('{}').
+        replace('-', '').lower()
+    )
+
+    return _UUID_HEX_PATTERN.fullmatch(val) is not None
+
+
 def is_valid_uuid(uuid_string):
-    return uuidutils.is_uuid_like(uuid_string)
+    return _is_valid_uuid(uuid_string)
 
 
-def _get_thread_local_storage():
-    if not hasattr(_th_loc_storage, "storage"):
-        _th_loc_storage.storage = {}
-    return _th_loc_storage.storage
+def validate_uuids(values):
+    """Validates UUID strings.
+
+    Each value is validated the same way as with is_valid_uuid() but
+    without creating intermediate UUID objects.
+
+    :param values: An iterable of values.
+    :return: A list of booleans, one per value.
+    """
+
+    return [_is_valid_uuid(v) for v in values]
+
+
+def _get_context_var(var_name):
+    var = _context_vars.get(var_name)
+
+    if var is None:
+        # NOTE: Context variables are never garbage collected so only
+        # one variable is created per name.
+        with _context_vars_lock:
+            var = _context_vars.get(var_name)
+
+            if var is None:
+                var = contextvars.ContextVar(var_name, default=None)
+
+                _context_vars[var_name] = var
+
+    return var
 
 
 def has_thread_local(var_name):
-    return var_name in _get_thread_local_storage()
+    return get_thread_local(var_name) is not None
 
 
 def get_thread_local(var_name):
-    return _get_thread_local_storage().get(var_name)
+    var = _context_vars.get(var_name)
+
+    return var.get() if var is not None else None
 
 
 def set_thread_local(var_name, val):
-    storage = _get_thread_local_storage()
+    """Sets the value local to the current thread, greenthread or task.
 
-    if val is None:
-        storage.pop(var_name, None)
-        if not storage:
-            delattr(_th_loc_storage, "storage")
-    else:
-        storage[var_name] = val
+    :param var_name: Variable name.
+    :param val: Value. None removes the variable.
+    """
+
+    _get_context_var(var_name).set(val)
+
+
+@contextlib.contextmanager
+def thread_local_scope(var_name, val):
+    """Sets the thread local value for the duration of the block.
+
+    The previous value is restored on exit.
+    """
+
+    token = _get_context_var(var_name).set(val)
+
+    try:
+        yield
+    finally:
+        token.var.reset(token)
 
 
 def log_exec(logger, level=logging.DEBUG):
@@ -100,6 +214,91 @@ def log_exec(logger, level=logging.DEBUG):
     return _decorator
 
 
+MERGE_OVERWRITE = 'overwrite'
+MERGE_KEEP = 'keep'
+MERGE_APPEND = 'append'
+
+
+def _is_changed(old_v, new_v):
+    # Identity is checked first since it's cheap. Equal values parsed
+    # from JSON are usually different objects though so they need to be
+    # compared. Values of different types (e.g. 1 and True) are always
+    # considered different since they're different in JSON.
+    if old_v is new_v:
+        return False
+
+    return type(old_v) is not type(new_v) or old_v != new_v
+
+
+def _merge_values(policy, path, left_v, right_v):
+    """Calculates a merged value according to the policy.
+
+    :return: Tuple (value, changed).
+    """
+
+    if policy == MERGE_OVERWRITE:
+        return right_v, _is_changed(left_v, right_v)
+
+    if policy == MERGE_KEEP:
+        return left_v, False
+
+    if policy == MERGE_APPEND:
+        if isinstance(left_v, list) and isinstance(right_v, list):
+            left_v.extend(right_v)
+
+            return left_v, bool(right_v)
+
+        return right_v, _is_changed(left_v, right_v)
+
+    if callable(policy):
+        val = policy(path, left_v, right_v)
+
+        return val, _is_changed(left_v, val)
+
+    raise ValueError("Unknown merge policy: %s" % policy)
+
+
+def _merge_dicts(left, right, policy, path_policies=None, changes=None):
+    # NOTE: The algorithm is iterative rather than recursive so that
+    # deeply nested dictionaries can't exceed the recursion limit.
+    track_paths = path_policies is not None or changes is not None
+
+    stack = [(left, right, ())]
+
+    while stack:
+        left_d, right_d, prefix = stack.pop()
+
+        for k, v in right_d.items():
+            path = prefix + (k,) if track_paths else None
+
+            if k not in left_d:
+                left_d[k] = v
+
+                if changes is not None:
+                    changes.append(path)
+
+                continue
+
+            left_v = left_d[k]
+
+            if isinstance(left_v, dict) and isinstance(v, dict):
+                stack.append((left_v, v, path))
+
+                continue
+
+            key_policy = (
+                path_policies.get(path, policy) if path_policies else policy
+            )
+
+            val, changed = _merge_values(key_policy, path, left_v, v)
+
+            if val is not left_v:
+                left_d[k] = val
+
+            if changed and changes is not None:
+                changes.append(path)
+
+
 def merge_dicts(left, right, overwrite=True):
     """Merges two dictionaries.
 
@@ -115,18 +314,239 @@ def merge_dicts(left, right, overwrite=True):
     if right is None:
         return left
 
+    _merge_dicts(left, right, MERGE_OVERWRITE if overwrite else MERGE_KEEP)
+
+    return left
+
+
+def merge_dicts_with_policy(left, right, policy=MERGE_OVERWRITE,
+                            path_policies=None):
+    """Merges two dictionaries using the given conflict policies.
+
+    Values of the right dictionary get merged into the left dictionary
+    that gets modified. Nested dictionaries are always merged key by key.
+    For other values existing in both dictionaries a policy decides
+    what the resulting value is:
+
+    - MERGE_OVERWRITE: the right value replaces the left one.
+    - MERGE_KEEP: the left value is kept.
+    - MERGE_APPEND: the right list is appended to the left list. Values
+      that are not lists are overwritten.
+    - A callable accepting the path, the left value and the right value
+      and returning the resulting value.
+
+    :param left: Left dictionary.
+    :param right: Right dictionary.
+    :param policy: Default policy.
+    :param path_policies: Optional. A dictionary where keys are paths,
+        i.e. tuples of keys leading to a value from the root, and values
+        are policies applied to the values on these paths.
+    :return: List of paths of the values that have been changed in the
+        left dictionary, in no particular order.
+    """
+
+    changes = []
+
+    if left is not None and right is not None:
+        _merge_dicts(left, right, policy, path_policies, changes)
+
+    return changes
+
+
+class PersistentDict(collections.abc.Mapping):
+    """Immutable dictionary sharing its state with its previous versions.
+
+    Every modification returns a new version of the dictionary. A new
+    version only keeps the changed keys and refers to the previous
+    version for the rest of them, so creating it takes time proportional
+    to the number of changed keys rather than to the size of the whole
+    dictionary. Once a chain of versions gets long, a new version gets
+    flattened to keep lookups fast.
+
+    A plain dictionary given to the constructor is used by reference
+    and must not be modified after that.
+    """
+
+    __slots__ = ('_layer', '_parent', '_depth', '_len', '_flat')
+
+    # Marker of a deleted key.
+    _DELETED = object()
+
+    # Maximum length of a chain of versions.
+    _MAX_DEPTH = 16
+
+    def __init__(self, data=None):
+        self._layer = {} if data is None else data
+        self._parent = None
+        self._depth = 0
+        self._len = len(self._layer)
+        self._flat = self._layer
+
+    def _derive(self, changes):
+        """Creates a new version with the given changes.
+
+        :param changes: A dictionary of changed keys. The value
+            PersistentDict._DELETED means that the key is deleted.
+        """
+
+        res = PersistentDict.__new__(PersistentDict)
+
+        length = self._len
+
+        for k, v in changes.items():
+            if k in self:
+                if v is self._DELETED:
+                    length -= 1
+            elif v is not self._DELETED:
+                length += 1
+
+        res._layer = changes
+        res._parent = self
+        res._depth = self._depth + 1
+        res._len = length
+        res._flat = None
+
+        if res._depth > self._MAX_DEPTH:
+            res._layer = res._flatten()
+            res._parent = None
+            res._depth = 0
+
+        return res
+
+    def _flatten(self):
+        if self._flat is not None:
+            return self._flat
+
+        layers = []
+        node = self
+
+        while node is not None:
+            if node._flat is not None:
+                layers.append(node._flat)
+
+                break
+
+            layers.append(node._layer)
+            node = node._parent
+
+        flat = dict(layers.pop())
+
+        for layer in reversed(layers):
+            for k, v in layer.items():
+                if v is self._DELETED:
+                    flat.pop(k, None)
+                else:
+                    flat[k] = v
+
+        self._flat = flat
+
+        return flat
+
+    def __getitem__(self, key):
+        if self._flat is not None:
+            return self._flat[key]
+
+        node = self
+
+        while node is not None:
+            if key in node._layer:
+                val = node._layer[key]
+
+                if val is self._DELETED:
+                    break
+
+                return val
+
+            node = node._parent
+
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+
+        return True
+
+    def __iter__(self):
+        return iter(self._flatten())
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return 'PersistentDict(%s)' % self._flatten()
+
+    def set(self, key, value):
+        """Returns a new version with the key set to the value."""
+
+        return self._derive({key: value})
+
+    def delete(self, key):
+        """Returns a new version without the key."""
+
+        if key not in self:
+            raise KeyError(key)
+
+        return self._derive({key: self._DELETED})
+
+    def to_dict(self):
+        """Converts the dictionary into a plain dictionary.
+
+        Nested persistent dictionaries are converted recursively.
+        """
+
+        return {
+            k: v.to_dict() if isinstance(v, PersistentDict) else v
+            for k, v in self._flatten().items()
+        }
+
+
+def merge_dicts_persistent(left, right, overwrite=True):
+    """Merges two dictionaries without modifying them.
+
+    Same as merge_dicts() but instead of modifying the left dictionary
+    it returns a new version of it as an instance of PersistentDict.
+    The new version shares all unchanged values, including nested
+    dictionaries, with the left dictionary so merging takes time
+    proportional to the size of the right dictionary.
+
+    :param left: Left dictionary. Either a plain dictionary, that must not
+        be modified after the call, or an instance of PersistentDict.
+    :param right: Right dictionary.
+    :param overwrite: If False, left value will not be overwritten if exists.
+    :return: An instance of PersistentDict.
+    """
+
+    if left is None:
+        return right
+
+    if right is None:
+        return left
+
+    if not isinstance(left, PersistentDict):
+        left = PersistentDict(left)
+
+    changes = {}
+
     for k, v in right.items():
         if k not in left:
-            left[k] = v
+            changes[k] = v
         else:
             left_v = left[k]
 
-            if isinstance(left_v, dict) and isinstance(v, dict):
-                merge_dicts(left_v, v, overwrite=overwrite)
+            if (isinstance(left_v, (dict, PersistentDict)) and
+                    isinstance(v, (dict, PersistentDict))):
+                changes[k] = merge_dicts_persistent(
+                    left_v,
+                    v,
+                    overwrite=overwrite
+                )
             elif overwrite:
-                left[k] = v
+                changes[k] = v
 
-    return left
+    return left._derive(changes) if changes else left
 
 
 def update_dict(left, right):
@@ -148,6 +568,154 @@ def update_dict(left, right):
     return left
 
 
+class DictPatch(serialization.MistralSerializable):
+    """Difference between two versions of a dictionary.
+
+    The patch consists of a dictionary of updated values and a list of
+    paths of deleted keys. A path is a list of keys leading to a value
+    from the root of the dictionary. Updated values of nested dictionaries
+    are represented by nested dictionaries containing only the updated
+    keys, so that the updates can be applied with merge_dicts().
+    """
+
+    __slots__ = ('updates', 'deletes')
+
+    def __init__(self, updates=None, deletes=None):
+        self.updates = updates or {}
+        self.deletes = deletes or []
+
+    def __bool__(self):
+        return bool(self.updates or self.deletes)
+
+    def __eq__(self, other):
+        if not isinstance(other, DictPatch):
+            return False
+
+        return (
+            self.updates == other.updates and
+            sorted(self.deletes) == sorted(other.deletes)
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'DictPatch(updates=%s, deletes=%s)' % (
+            self.updates,
+            self.deletes
+        )
+
+
+def dict_diff(old, new):
+    """Calculates the difference between two dictionaries.
+
+    Nested dictionaries are compared key by key, other values are
+    compared by equality.
+
+    :param old: Old dictionary.
+    :param new: New dictionary.
+    :return: An instance of DictPatch that turns the old dictionary into
+        the new one when applied with apply_patch(). Values of the patch
+        may be shared with the new dictionary.
+    """
+
+    old = old or {}
+    new = new or {}
+
+    updates = {}
+    deletes = []
+    nested = []
+
+    # NOTE: The algorithm is iterative, see _merge_dicts().
+    stack = [(old, new, updates, [])]
+
+    while stack:
+        old_d, new_d, updates_d, prefix = stack.pop()
+
+        for k in old_d:
+            if k not in new_d:
+                deletes.append(prefix + [k])
+
+        for k, new_v in new_d.items():
+            if k not in old_d:
+                updates_d[k] = new_v
+
+                continue
+
+            old_v = old_d[k]
+
+            if old_v is new_v:
+                continue
+
+            if isinstance(old_v, dict) and isinstance(new_v, dict):
+                nested_updates = {}
+
+                updates_d[k] = nested_updates
+                nested.append((updates_d, k))
+
+                stack.append((old_v, new_v, nested_updates, prefix + [k]))
+            elif old_v != new_v:
+                updates_d[k] = new_v
+
+    # Drop nested dictionaries without updates. Children are always
+    # created after their parents so the reversed order empties children
+    # before their parents are checked.
+    for updates_d, k in reversed(nested):
+        if not updates_d[k]:
+            del updates_d[k]
+
+    return DictPatch(updates, deletes)
+
+
+def apply_patch(base, patch):
+    """Applies the patch calculated by dict_diff() to the dictionary.
+
+    Deleted keys are removed first and then the updated values get
+    merged into the dictionary using merge_dicts(). The patch itself
+    isn't modified and its values aren't shared with the dictionary.
+
+    :param base: Dictionary to modify.
+    :param patch: An instance of DictPatch.
+    :return: the updated dictionary.
+    """
+
+    if base is None:
+        base = {}
+
+    for key_path in patch.deletes:
+        d = base
+
+        for k in key_path[:-1]:
+            d = d.get(k)
+
+            if not isinstance(d, dict):
+                break
+        else:
+            d.pop(key_path[-1], None)
+
+    if patch.updates:
+        merge_dicts(base, copy.deepcopy(patch.updates))
+
+    return base
+
+
+class DictPatchSerializer(serialization.DictBasedSerializer):
+    def serialize_to_dict(self, entity):
+        return {
+            'updates': entity.updates,
+            'deletes': entity.deletes
+        }
+
+    def deserialize_from_dict(self, entity_dict):
+        return DictPatch(
+            entity_dict.get('updates'),
+            entity_dict.get('deletes')
+        )
+
+
+serialization.register_serializer(DictPatch, DictPatchSerializer())
+
+
 def get_file_list(directory, package='mistral'):
     base_path = importlib.resources.files(package).joinpath(directory)
 
@@ -294,7 +862,58 @@ def cut(data, length=100):
     return cut_string(str(data), length=length)
 
 
-def cut_by_kb(data, kilobytes):
+def cut_by_bytes(data, max_bytes):
+    """Truncates string representation of data for a given number of bytes.
+
+    Unlike cut(), the limit applies to the size of the UTF-8 encoded
+    result so that it reliably fits into storage limits defined in bytes
+    (e.g. a DB column size). The representation is first truncated by
+    characters, which bounds the amount of work by the limit, and then
+    its encoded size is checked and reduced further if needed, without
+    splitting multi-byte characters.
+
+    :param data: a dictionary, list or string to truncate
+    :param max_bytes: maximum number of bytes in the UTF-8 encoded result
+    :return: string which UTF-8 encoded size doesn't exceed the limit
+    """
+    res = cut(data, max_bytes)
+
+    if not res or not isinstance(res, str):
+        return res
+
+    encoded = res.encode('utf-8')
+
+    if len(encoded) <= max_bytes:
+        return res
+
+    ellipsis = '...'
+
+    if max_bytes <= len(ellipsis):
+        # No room for anything but the ellipsis so the head is returned
+        # as is. Dropping an incomplete trailing character, if any.
+        return encoded[:max(0, max_bytes)].decode('utf-8', errors='ignore')
+
+    head = encoded[:max_bytes - len(ellipsis)].decode(
+        'utf-8',
+        errors='ignore'
+    )
+
+    return head + ellipsis
+
+
+def cut_by_kb(data, kilobytes, in_bytes=False):
+    """Truncates string representation of data for a given size.
+
+    :param data: a dictionary, list or string to truncate
+    :param kilobytes: size limit in kilobytes
+    :param in_bytes: if True, the limit applies to the size of the UTF-8
+        encoded result. Otherwise, it's converted into a number of
+        characters.
+    :return: truncated string
+    """
+    if in_bytes:
+        return cut_by_bytes(data, int(kilobytes * 1024))
+
     length = get_number_of_chars_from_kilobytes(kilobytes)
     return cut(data, length)
 
@@ -303,6 +922,13 @@ def cut_by_char(data, length):
     return cut(data, length)
 
 
+def _get_direct_subclasses(cls):
+    try:
+        return cls.__subclasses__()
+    except TypeError:  # fails only when cls is type
+        return cls.__subclasses__(cls)
+
+
 def iter_subclasses(cls, _seen=None):
     """Generator over all subclasses of a given class in depth first order."""
 
@@ -311,17 +937,146 @@ def iter_subclasses(cls, _seen=None):
                         ', not %.100r' % cls)
     _seen = _seen or set()
 
-    try:
-        subs = cls.__subclasses__()
-    except TypeError:  # fails only when cls is type
-        subs = cls.__subclasses__(cls)
+    # NOTE: A stack of iterators is used instead of recursion so that
+    # a deep hierarchy doesn't create a chain of nested generators.
+    stack = [iter(_get_direct_subclasses(cls))]
+
+    while stack:
+        for sub in stack[-1]:
+            if sub not in _seen:
+                _seen.add(sub)
+                yield sub
+                stack.append(iter(_get_direct_subclasses(sub)))
+
+                break
+        else:
+            stack.pop()
+
+
+# Name of the class attribute marking classes created by
+# create_dynamic_class(). Not public so that it's not considered
+# a class field by inspect_utils.get_public_fields().
+_DYNAMIC_CLASS_ATTR = '_mistral_dynamic_class'
+
+# Maps cls to {concrete_only: (generation, weak references to subclasses)}.
+_SUBCLASS_CACHE = weakref.WeakKeyDictionary()
+_SUBCLASS_GENERATION = 0
+
+# Classes whose subclasses are tracked by track_subclasses().
+_TRACKED_CLASSES = weakref.WeakSet()
+
+
+def create_dynamic_class(cls, cls_attrs):
+    """Creates a subclass of the given class with the given attributes.
 
-    for sub in subs:
-        if sub not in _seen:
-            _seen.add(sub)
-            yield sub
-            for _sub in iter_subclasses(sub, _seen):
-                yield _sub
+    Such classes only carry class attributes of an object and they are
+    excluded from get_subclasses() by default.
+    """
+
+    cls_attrs = dict(cls_attrs)
+    cls_attrs[_DYNAMIC_CLASS_ATTR] = True
+
+    return type(cls.__name__, (cls,), cls_attrs)
+
+
+def is_dynamic_class(cls):
+    return cls.__dict__.get(_DYNAMIC_CLASS_ATTR, False)
+
+
+def _is_abstract(cls):
+    if inspect.isabstract(cls):
+        return True
+
+    # NOTE: Some base classes (e.g. Action) declare abstract methods
+    # without using ABCMeta so they need to be checked explicitly.
+    return any(
+        getattr(getattr(cls, name, None), '__isabstractmethod__', False)
+        for name in dir(cls)
+    )
+
+
+def _bump_subclass_generation():
+    global _SUBCLASS_GENERATION
+
+    _SUBCLASS_GENERATION += 1
+
+
+def track_subclasses(cls):
+    """Makes get_subclasses() cache its results for the given class.
+
+    Must be called for a root class and for every its subclass when it's
+    created, e.g. from __init_subclass__(). Any change of the hierarchy,
+    i.e. creating or removing a tracked class, invalidates the cache.
+    Dynamic classes are not supposed to be tracked.
+    """
+
+    _TRACKED_CLASSES.add(cls)
+
+    _bump_subclass_generation()
+
+    finalizer = weakref.finalize(cls, _bump_subclass_generation)
+    finalizer.atexit = False
+
+
+def invalidate_subclass_cache():
+    """Invalidates the results cached by get_subclasses().
+
+    Creating and removing tracked classes invalidates the cache
+    automatically. This is only needed if something else that affects
+    the result changes, e.g. abstract methods of an existing class.
+    """
+
+    _bump_subclass_generation()
+
+
+def get_subclasses(cls, concrete_only=True, include_dynamic=False):
+    """Returns all subclasses of a given class in depth first order.
+
+    Unlike iter_subclasses() the result is cached if the class is
+    tracked with track_subclasses() (e.g. subclasses of Action) so
+    repeated calls only check that the hierarchy hasn't changed since
+    then and copy the result. Classes are referenced weakly so the
+    cache doesn't keep removed classes alive. For other classes the
+    hierarchy is walked on every call.
+
+    :param cls: Class.
+    :param concrete_only: If True, classes having abstract methods
+        are excluded.
+    :param include_dynamic: If True, classes created with
+        create_dynamic_class() are included. Such classes come and go
+        with objects using them so the result is not cached in this case.
+    :return: A tuple of classes.
+    """
+
+    cacheable = not include_dynamic and cls in _TRACKED_CLASSES
+
+    if cacheable:
+        entries = _SUBCLASS_CACHE.get(cls)
+        entry = entries.get(concrete_only) if entries else None
+
+        if entry is not None and entry[0] == _SUBCLASS_GENERATION:
+            subclasses = tuple(ref() for ref in entry[1])
+
+            if None not in subclasses:
+                return subclasses
+
+    # Read the generation before walking the hierarchy so that a class
+    # created in the meantime invalidates the result.
+    generation = _SUBCLASS_GENERATION
+
+    subclasses = tuple(
+        sub for sub in iter_subclasses(cls)
+        if (include_dynamic or not is_dynamic_class(sub)) and
+        not (concrete_only and _is_abstract(sub))
+    )
+
+    if cacheable:
+        _SUBCLASS_CACHE.setdefault(cls, {})[concrete_only] = (
+            generation,
+            tuple(weakref.ref(sub) for sub in subclasses)
+        )
+
+    return subclasses
 
 
 def random_sleep(limit=1):
@@ -399,16 +1154,74 @@ def get_dict_from_entries(entries):
     return result
 
 
+_process_identifier = None
+
+
+def _reset_process_identifier():
+    global _process_identifier
+
+    _process_identifier = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_process_identifier)
+
+
 def get_process_identifier():
     """Gets current running process identifier."""
 
-    return "%s_%s" % (socket.gethostname(), os.getpid())
+    global _process_identifier
+
+    # NOTE: The identifier is cached and reset in child processes
+    # after fork so that it always contains the current PID.
+    if _process_identifier is None:
+        _process_identifier = "%s_%s" % (socket.gethostname(), os.getpid())
+
+    return _process_identifier
+
+
+# The original function to detect if it's mocked in tests.
+_timeutils_utcnow = timeutils.utcnow
+
+# Tuple (timestamp in seconds, datetime) of the last utc_now_sec() call.
+_utc_now_sec_cache = (None, None)
+
+
+def _is_utcnow_overridden():
+    return (
+        timeutils.utcnow is not _timeutils_utcnow or
+        getattr(timeutils, '_override_time', None) is not None or
+        getattr(timeutils.utcnow, 'override_time', None) is not None
+    )
 
 
 def utc_now_sec():
-    """Returns current time and drops microseconds."""
+    """Returns current time and drops microseconds.
+
+    The same datetime object is returned by all calls made within the
+    same second.
+    """
+
+    global _utc_now_sec_cache
+
+    if _is_utcnow_overridden():
+        return drop_microseconds(timeutils.utcnow())
+
+    now_sec = int(time.time())
+
+    cached_sec, cached_date = _utc_now_sec_cache
 
-    return drop_microseconds(timeutils.utcnow())
+    if cached_sec == now_sec:
+        return cached_date
+
+    date = datetime.datetime.fromtimestamp(
+        now_sec,
+        datetime.timezone.utc
+    ).replace(tzinfo=None)
+
+    _utc_now_sec_cache = (now_sec, date)
+
+    return date
 
 
 def drop_microseconds(date):
@@ -445,16 +1258,87 @@ def datetime_to_str_in_dict(d, key, sep=' '):
         d[key] = datetime_to_str(d[key], sep=sep)
 
 
-def generate_string(length):
+def datetime_to_str_in_dicts(dicts, keys, sep=' '):
+    """Converts datetime values in the given dicts to strings.
+
+    It's the same as calling datetime_to_str_in_dict() for each dict
+    and key but in one pass.
+
+    :param dicts: An iterable of dictionaries.
+    :param keys: An iterable of keys for which we need to convert values.
+    :param sep: Separator between date and time.
+    """
+
+    keys = tuple(keys)
+    dt_type = datetime.datetime
+
+    for d in dicts:
+        for key in keys:
+            val = d.get(key)
+
+            if isinstance(val, dt_type):
+                d[key] = val.isoformat(sep)
+
+
+_STRING_ALPHABET = string.ascii_uppercase + string.digits
+
+# Random bytes not less than the limit are dropped so that every
+# character of the alphabet has the same probability.
+_SECURE_BYTE_LIMIT = 256 - 256 % len(_STRING_ALPHABET)
+_SECURE_BYTE_TABLE = bytes(
+    ord(_STRING_ALPHABET[b % len(_STRING_ALPHABET)]) for b in range(256)
+)
+_SECURE_BYTE_REJECTED = bytes(range(_SECURE_BYTE_LIMIT, 256))
+
+
+def _generate_secure_chars(length):
+    chars = b''
+
+    while len(chars) < length:
+        # A few more bytes are read to compensate the rejected ones.
+        data = os.urandom(length - len(chars) + 16)
+
+        chars += data.translate(_SECURE_BYTE_TABLE, _SECURE_BYTE_REJECTED)
+
+    return chars[:length].decode('ascii')
+
+
+def _generate_chars(length, secure):
+    if secure:
+        return _generate_secure_chars(length)
+
+    return ''.join(random.choices(_STRING_ALPHABET, k=length))
+
+
+def generate_string(length, secure=False):
     """Returns random string.
 
     :param length: the length of returned string
+    :param secure: If True, the string is generated using a
+        cryptographically secure source of randomness.
     """
 
-    return ''.join(random.choice(
-        string.ascii_uppercase + string.digits)
-        for _ in range(length)
-    )
+    return _generate_chars(length, secure)
+
+
+def generate_strings(count, length, secure=False):
+    """Returns a list of random strings.
+
+    It's the same as calling generate_string() multiple times but all
+    the randomness is drawn at once.
+
+    :param count: the number of strings
+    :param length: the length of every string
+    :param secure: If True, the strings are generated using a
+        cryptographically secure source of randomness.
+    """
+
+    if not length:
+        return [''] * count
+
+    chars = _generate_chars(count * length, secure)
+
+    return [chars[i:i + length] for i in range(0, count * length, length)]
 
 
 def mask_data(obj):
@@ -466,6 +1350,24 @@ def mask_data(obj):
         return mask_password(obj)
 
 
+def _json_fallback(value):
+    if inspect.isgenerator(value):
+        result = list(value)
+
+        # The result of the generator call may be again not primitive
+        # so we need to call "to_primitive" again with the same fallback
+        # function. Note that the endless recursion here is not a problem
+        # because "to_primitive" limits the depth for custom classes,
+        # if they are present in the object graph being traversed.
+        return jsonutils.to_primitive(
+            result,
+            convert_instances=True,
+            fallback=_json_fallback
+        )
+
+    return value
+
+
 def to_json_str(obj):
     """Serializes an object into a JSON string.
 
@@ -476,40 +1378,180 @@ def to_json_str(obj):
     if obj is None:
         return None
 
-    def _fallback(value):
-        if inspect.isgenerator(value):
-            result = list(value)
-
-            # The result of the generator call may be again not primitive
-            # so we need to call "to_primitive" again with the same fallback
-            # function. Note that the endless recursion here is not a problem
-            # because "to_primitive" limits the depth for custom classes,
-            # if they are present in the object graph being traversed.
-            return jsonutils.to_primitive(
-                result,
+    def _default(value):
+        # NOTE: Mappings (e.g. persistent dictionaries) are converted
+        # one level at a time so that they're not subject to the depth
+        # limit that "to_primitive" applies to non-dict objects.
+        if isinstance(value, collections.abc.Mapping):
+            return dict(value.items())
+
+        # Objects of custom classes are converted into primitives
+        # explicitly. Otherwise, they are ignored by the "json" lib.
+        return jsonutils.to_primitive(
+            value,
+            convert_instances=True,
+            fallback=_json_fallback
+        )
+
+    try:
+        return jsonutils.dumps(obj, default=_default)
+    except TypeError:
+        # E.g. keys of types unsupported by the "json" lib.
+        return jsonutils.dumps(
+            jsonutils.to_primitive(
+                obj,
                 convert_instances=True,
-                fallback=_fallback
+                fallback=_json_fallback
             )
+        )
 
-        return value
 
-    # We need to convert the root of the given object graph into
-    # a primitive by hand so that we also enable conversion of
-    # object of custom classes into primitives. Otherwise, they are
-    # ignored by the "json" lib.
-    return jsonutils.dumps(
-        jsonutils.to_primitive(obj, convert_instances=True, fallback=_fallback)
-    )
+_JSON_CONSTANT_SIZES = {
+    None: len('null'),
+    True: len('true'),
+    False: len('false'),
+}
+
+_JSON_SEPARATOR_SIZE = len(', ')
+_JSON_KEY_SEPARATOR_SIZE = len(': ')
+
+
+def _get_json_scalar_size(val):
+    """Returns the size of a JSON scalar or None if it's not a scalar."""
+
+    # NOTE: Subclasses of the scalar types (e.g. enums) are serialized by
+    # the "json" lib same as the base types. "bool" must be checked before
+    # "int" because it's a subclass of "int".
+    if isinstance(val, str):
+        return len(json.encoder.encode_basestring_ascii(val))
+
+    if val is None or isinstance(val, bool):
+        return _JSON_CONSTANT_SIZES[val]
+
+    if isinstance(val, int):
+        return len(int.__repr__(val))
+
+    if isinstance(val, float):
+        if val != val:
+            return len('NaN')
+
+        if val in (float('inf'), float('-inf')):
+            return len('Infinity') + (val < 0)
+
+        return len(float.__repr__(val))
+
+    return None
+
+
+def estimate_serialized_size(obj, limit=None):
+    """Calculates the size of the object converted into JSON.
+
+    The method walks the object graph once without building the JSON
+    string. Values that are not JSON primitives are converted using the
+    same rules as in the method to_json_str() so the result is equal to
+    the length of the string returned by that method. Note that, same as
+    for to_json_str(), generators found in the graph get exhausted.
+
+    :param obj: Object to estimate.
+    :param limit: Optional. If the size exceeds the limit the method
+        stops and returns the size calculated so far which is greater
+        than the limit.
+    :return: Number of characters in the JSON representation.
+    """
+
+    if obj is None:
+        return 0
+
+    size = 0
+
+    # Containers being traversed, to detect circular references. They're
+    # referenced until traversed so that the ID of a temporary container
+    # (e.g. a dict made of a mapping) can't be reused by another one.
+    active = {}
+
+    _exit = object()
+
+    stack = [obj]
+
+    while stack:
+        val = stack.pop()
+
+        if val is _exit:
+            del active[stack.pop()]
+
+            continue
+
+        scalar_size = _get_json_scalar_size(val)
+
+        if scalar_size is not None:
+            size += scalar_size
+        elif type(val) in (dict, list, tuple):
+            if id(val) in active:
+                raise ValueError("Circular reference detected")
+
+            n = len(val)
+
+            size += 2 + (n - 1) * _JSON_SEPARATOR_SIZE if n else 2
+
+            if n:
+                active[id(val)] = val
+
+                stack.append(id(val))
+                stack.append(_exit)
+
+            if type(val) is dict:
+                for k, v in val.items():
+                    key_size = _get_json_scalar_size(k)
+
+                    if key_size is None:
+                        raise TypeError(
+                            "Keys must be str, int, float, bool or None,"
+                            " not %s" % type(k).__name__
+                        )
+
+                    if not isinstance(k, str):
+                        # Non-string keys are converted into strings.
+                        key_size += 2
+
+                    size += key_size + _JSON_KEY_SEPARATOR_SIZE
+
+                    stack.append(v)
+            else:
+                stack.extend(val)
+        elif isinstance(val, collections.abc.Mapping):
+            stack.append(dict(val.items()))
+        else:
+            primitive = jsonutils.to_primitive(
+                val,
+                convert_instances=True,
+                fallback=_json_fallback
+            )
+
+            if primitive is val:
+                # The object can't be converted any further so walking
+                # it again would never end.
+                raise TypeError(
+                    "Object of type %s is not JSON serializable"
+                    % type(val).__name__
+                )
+
+            stack.append(primitive)
+
+        if limit is not None and size > limit:
+            return size
+
+    return size
 
 
 def from_json_str(json_str):
     """Reconstructs an object from a JSON string.
 
-    :param json_str: A JSON string.
+    :param json_str: A JSON string or a bytes-like object (bytes,
+        bytearray, memoryview, mmap) with UTF-8 encoded JSON.
     :return: Deserialized object.
     """
 
     if json_str is None:
         return None
 
-    return jsonutils.loads(json_str)
+    return serialization.loads(json_str)
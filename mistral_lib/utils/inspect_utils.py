@@ -14,6 +14,8 @@
 
 import inspect
 import json
+import types
+import typing
 
 
 def get_public_fields(obj):
@@ -88,3 +90,83 @@ def get_arg_list_as_str(func):
 
 def get_args_spec(func):
     return inspect.getfullargspec(func)
+
+
+def _get_runtime_types(annotation):
+    # Converts a type annotation into a tuple of classes that can be
+    # passed to isinstance(), or None if it can't be checked at runtime.
+    if annotation is None:
+        return (type(None),)
+
+    if annotation is typing.Any:
+        return None
+
+    origin = typing.get_origin(annotation)
+
+    if origin is typing.Union or origin is types.UnionType:
+        res = []
+
+        for arg in typing.get_args(annotation):
+            arg_types = _get_runtime_types(arg)
+
+            if arg_types is None:
+                return None
+
+            res.extend(arg_types)
+
+        return tuple(res)
+
+    if origin is not None:
+        # A parameterized generic, e.g. list[int], only its origin
+        # can be checked.
+        annotation = origin
+
+    if not isinstance(annotation, type):
+        return None
+
+    if annotation is float:
+        # Integers are acceptable where floats are expected.
+        return (float, int)
+
+    return (annotation,)
+
+
+def get_arg_types(func):
+    """Returns types of function arguments from their annotations.
+
+    Only annotations that can be checked with isinstance() are taken into
+    account, e.g. "int", "list[str]" (checked as "list") or "str | None".
+    If the default value of an argument is None then None is always
+    acceptable for it.
+
+    :param func: Function.
+    :return: A dictionary where keys are argument names and values are
+        tuples of classes.
+    """
+
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        # Unresolvable forward references.
+        hints = {}
+
+    res = {}
+
+    for name, param in inspect.signature(func).parameters.items():
+        if name == 'self' or name not in hints:
+            continue
+
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+
+        arg_types = _get_runtime_types(hints[name])
+
+        if arg_types is None:
+            continue
+
+        if param.default is None and type(None) not in arg_types:
+            arg_types += (type(None),)
+
+        res[name] = arg_types
+
+    return res